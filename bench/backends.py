@@ -0,0 +1,72 @@
+"""Compare the speed of the type checker backends on the same tree.
+
+    python bench/backends.py TREE [BACKEND ...]
+
+For each backend, time the type checker alone, then the whole find pipeline (the
+checker, parsing and edit generation) with the default rules. `pyright
+--verifytypes` needs TREE to be an importable package name.
+"""
+
+from __future__ import annotations
+
+import argparse
+import shlex
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from fixo.blocks.python_file import python_files
+from fixo.importer import import_dict
+from fixo.pipeline import Pipeline
+from fixo.rules import default_rules
+
+BACKENDS = 'pyright', 'pyrefly', 'direct'
+
+
+def bench(backend: str, tree: str) -> str:
+    b = import_dict(f'.{backend}')
+    rules = default_rules(f'.{backend}')
+    pipeline = Pipeline(rules, b.get('parse_lines') or _joined(rules))
+    pipeline.scan = b.get('scan_file')
+    cmd = [*shlex.split(b['type_command_string']), tree]
+
+    checker = 0.0
+    if pipeline.scan is not None:
+        start = time.perf_counter()
+        edits = pipeline.run_files(str(p) for p in python_files([Path(tree)]))
+    else:
+        start = time.perf_counter()
+        subprocess.run(cmd, capture_output=True, check=True)
+        checker = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True) as p:
+            assert p.stdout is not None
+            edits = pipeline.run(p.stdout)
+
+    total = time.perf_counter() - start
+    count = sum(len(e) for e in edits.values())
+    return f'{backend:8} checker {checker:8.3f}s  pipeline {total:8.3f}s  {count} edits'
+
+
+def _joined(rules):
+    parse = next(iter(rules.values())).parse_into_messages
+    return lambda lines: parse(''.join(lines))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('tree')
+    parser.add_argument('backends', nargs='*', default=BACKENDS)
+    a = parser.parse_args()
+
+    for backend in a.backends:
+        try:
+            print(bench(backend, a.tree))
+        except Exception as e:
+            print(f'{backend:8} failed: {e!r}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Compare generating edits on threads with generating them in processes.
+
+    python bench/engines.py TREE [--jobs N ...]
+
+Each run scans every Python file in TREE with the `direct` backend, so no type
+checker is involved, and edits the files with the default rules. Threads only run
+in parallel on a free-threaded Python build: elsewhere, they show what the GIL costs.
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from pathlib import Path
+
+from fixo.blocks.python_file import python_files
+from fixo.concurrency import is_free_threaded, make_executor
+from fixo.importer import import_dict
+from fixo.pipeline import Pipeline
+from fixo.rules import default_rules
+
+ENGINES = 'thread', 'process'
+
+
+def bench(engine: str, jobs: int, files: list[str]) -> str:
+    b = import_dict('.direct')
+    executor = make_executor(jobs, engine)
+    pipeline = Pipeline(
+        default_rules('.direct'),
+        _no_messages,
+        executor=executor,
+        workers=max(jobs, 4),
+        scan=b['scan_file'],
+    )
+    try:
+        start = time.perf_counter()
+        edits = pipeline.run_files(files)
+        total = time.perf_counter() - start
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    count = sum(len(e) for e in edits.values())
+    return f'{engine:8} jobs {jobs:3}  {total:8.3f}s  {count} edits'
+
+
+def _no_messages(lines):
+    return iter(())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('tree')
+    parser.add_argument('--jobs', type=int, nargs='*', default=[2, 4, 8])
+    a = parser.parse_args()
+
+    files = [str(p) for p in python_files([Path(a.tree)])]
+    gil = 'disabled' if is_free_threaded() else 'enabled'
+    print(f'{len(files)} files, GIL {gil}')
+    print(bench('thread', 1, files))
+    for jobs in a.jobs:
+        for engine in ENGINES:
+            print(bench(engine, jobs, files))
+
+
+if __name__ == '__main__':
+    main()
@@ -5,14 +5,31 @@ import json
 import shlex
 import subprocess
 import sys
-from collections.abc import Sequence
+import time
+from collections.abc import Collection, Iterable, Iterator, Sequence, Sized
+from concurrent.futures import Executor
 from functools import cache, cached_property, partial
 from pathlib import Path
 from typing import TYPE_CHECKING, Any
 
-from . import type_edit
-from .blocks.python_file import PythonFile
+from . import store, tui, type_edit
+from .blocks.python_file import python_files
+from .cache import RuleCache
+from .concurrency import ENGINES, make_executor
+from .conflicts import merge
+from .diff import diffs
+from .git_source import MISSING, GitSource
+from .importer import import_dict
+from .index import SymbolIndex
+from .journal import Journal
+from .lintrunner import lint
+from .memory import MemoryBudget, parse_size
+from .pipeline import CHANGED, FileEdits, FileItem, ParseLines, Pipeline
+from .prefilter import Prefilter
+from .progress import Progress
+from .public import PublicApi
 from .rules import make_rules
+from .verify import check_files, report
 
 if TYPE_CHECKING:
     from .rule import Rule
@@ -20,36 +37,114 @@ if TYPE_CHECKING:
 
 MAX_ERROR_CHARS = 1024
 
+# The longest list of files to put on a type checker's command line, well under
+# the operating system limits
+MAX_COMMAND_CHARS = 32_000
+
 _err = partial(print, file=sys.stderr)
 
 
 @cache
 def args() -> argparse.Namespace:
-    parser = argparse.ArgumentParser()
+    parser = argparse.ArgumentParser(fromfile_prefix_chars='@')
     add = parser.add_argument
 
-    help = """If the files end in .json, they are edits to be executed, otherwise,
-    they are a list of files or directories to be passed to the type checker."""
+    help = """If the file ends in .json, it has edits to be executed; if it ends in .db
+    or .sqlite, it is an edit store to select from. Otherwise, the files are
+    a list of files or directories to be passed to the type checker."""
     add('files', nargs='+', type=Path, help=help)
 
+    help = 'Print a unified diff of the edits instead of writing edits or files'
+    add('-d', '--diff', action='store_true', help=help)
+
+    help = 'Print one lintrunner JSON message per file, instead of an edits file'
+    add('-l', '--lintrunner', action='store_true', help=help)
+
+    help = 'With an edit store: mark the selected edits'
+    add('-m', '--mark', choices=[s.value for s in store.Status], help=help)
+
     help = "Immediately edit, don't write an edit file to be executed"
     add('-i', '--edit-immediately', action='store_true', help=help)
 
+    help = 'Cache the edits made by each rule to each file in this directory'
+    add('--cache', type=Path, default=None, help=help)
+
     help = 'Command line or JSON file for type completeness'
     add('-c', '--type-completeness', type=str, default='', help=help)
 
+    help = """Keep this process's memory under a budget like 4G, by finding edits for
+    files in batches and writing out the edits for each batch as soon as it is done"""
+    add('--max-memory', type=parse_size, default=0, help=help)
+
+    help = """Keep a symbol index of the files in this SQLite file, re-indexing only
+    files that changed. Then print the symbols selected by --where, or else find
+    edits by evaluating the rules against the index, as with -t direct"""
+    add('--index', type=Path, default=None, help=help)
+
+    help = "Number of workers generating edits: 0 or 1 means use asyncio's threads"
+    add('-j', '--jobs', type=int, default=0, help=help)
+
+    help = """Whether the --jobs workers are processes or threads: 'auto' means
+    threads on a free-threaded Python build, and processes otherwise"""
+    add('--engine', choices=ENGINES, default='auto', help=help)
+
+    help = """Read source files from this git revision, not the working tree. The
+    type checker still sees the working tree, so pass its report with -c or use
+    -t direct"""
+    add('--revision', type=str, default='', help=help)
+
+    help = """Report files, messages and edits per second on stderr: as a status line
+    on a terminal, otherwise as a JSON line every 10 seconds"""
+    add('--progress', action='store_true', help=help)
+
+    help = """Only edit the public API: names in `__all__` of public modules, or not
+    starting with _ if there is none, and names re-exported by public packages"""
+    add('--public', action='store_true', help=help)
+
     help = 'Rules from the rule set to use'
     add('-r', '--rules', nargs='*', help=help)
 
+    help = 'Skip files and messages whose text cannot match any rule'
+    add('-f', '--prefilter', action='store_true', help=help)
+
+    help = 'Rule names in priority order, for edits that collide: default is rule order'
+    add('-p', '--priority', nargs='*', default=(), help=help)
+
     help = 'The rule set to use'
     add('-s', '--rule-set', type=str, default='', help=help)
 
-    help = 'Which type checker to use?'
-    add('-t', '--type-checker', default='pyright', help=help)
+    help = """Which type checker to use: the default is pyright. 'direct' reads the
+    files without one, as --index always does"""
+    add('-t', '--type-checker', default='', help=help)
+
+    help = 'Record finished work in this checkpoint journal'
+    add('--journal', type=Path, default=None, help=help)
+
+    help = 'Resume from the --journal, skipping work that was already finished'
+    add('--resume', action='store_true', help=help)
+
+    help = 'Write the edits found into this SQLite edit store'
+    add('--store', type=Path, default=None, help=help)
+
+    help = """With -i: re-check the files edited in each round and edit them again,
+    until a round finds no new edits or after this many rounds"""
+    add('--until-fixed-point', type=int, default=0, metavar='ROUNDS', help=help)
+
+    help = """With a .json edits file and an output file after it: choose which edits
+    to accept in a terminal interface, and write the accepted edits to the output"""
+    add('--tui', action='store_true', help=help)
 
     help = 'Print more debug info'
     add('-v', '--verbose', action='store_true', help=help)
 
+    help = """With an edit store: an SQL condition selecting edits, like "rule='bools'".
+    With --index: one selecting symbols, like "param REGEXP 'is_' AND NOT annotated"
+    """
+    add('--where', type=str, default='', help=help)
+
+    help = 'How many files can be having their edits generated at the same time'
+    add('-w', '--workers', type=int, default=4, help=help)
+
     return parser.parse_args()
 
 
@@ -58,24 +153,93 @@ class FixoError(Exception):
 
 
 def main() -> None:
+    fixo = Fixo()
     try:
-        Fixo().main()
+        fixo.main()
     except FixoError as e:
         sys.exit('ERROR: ' + e.args[0])
+    finally:
+        fixo.close()
 
 
 class Fixo:
+    # How many edits were stored, and files written as JSON, by `_output()`
+    _stored = 0
+    _json_files = 0
+
     def main(self) -> None:
-        if not any(f.suffix == '.json' for f in args().files):
+        if args().diff and args().edit_immediately:
+            raise FixoError('Only one of --diff and --edit-immediately is allowed')
+        if args().lintrunner and (args().diff or args().edit_immediately):
+            raise FixoError('--lintrunner cannot be used with --diff or -i')
+        if args().revision and args().edit_immediately:
+            raise FixoError('Cannot --edit-immediately files read from a --revision')
+        if args().until_fixed_point and not args().edit_immediately:
+            raise FixoError('--until-fixed-point needs --edit-immediately')
+        if args().index and (args().revision or args().until_fixed_point):
+            raise FixoError('Cannot use --index with --revision or --until-fixed-point')
+        if args().index and args().type_checker not in ('', 'direct'):
+            raise FixoError('--index only works with -t direct')
+        suffixes = {f.suffix for f in args().files}
+        if args().index:
+            self._index()
+        elif not suffixes.intersection(('.json', *store.SUFFIXES)):
             self._find()
-        elif len(args().files) == 1:
-            self._execute()
+        elif args().tui:
+            self._choose()
+        elif len(args().files) != 1:
+            raise FixoError('Only one .json or edit store file is allowed')
+        elif suffixes.issubset(store.SUFFIXES):
+            self._select()
         else:
-            raise FixoError('Only only .json file is allowed')
+            self._execute()
+
+    def close(self) -> None:
+        """Release whatever resources were actually created"""
+        if executor := vars(self).get('executor'):
+            executor.shutdown()
+        for name in ('edit_store', 'journal', 'source', 'symbol_index'):
+            if resource := vars(self).get(name):
+                resource.close()
 
     @cached_property
     def parent(self) -> str:
-        return f'.{args().type_checker}'
+        return '.direct' if args().index else f'.{args().type_checker or "pyright"}'
+
+    @cached_property
+    def executor(self) -> Executor | None:
+        return make_executor(args().jobs, args().engine)
+
+    @cached_property
+    def progress(self) -> Progress | None:
+        return Progress() if args().progress else None
+
+    @cached_property
+    def journal(self) -> Journal | None:
+        if args().journal:
+            return Journal(args().journal, resume=args().resume)
+        if args().resume:
+            raise FixoError('--resume needs a --journal')
+        return None
+
+    @cached_property
+    def source(self) -> GitSource | None:
+        if not args().revision:
+            return None
+        if not (source := GitSource(args().revision)).verify():
+            raise FixoError(f'Unknown --revision: {args().revision}')
+        return source
+
+    @cached_property
+    def backend(self) -> dict[str, Any]:
+        return import_dict(self.parent)
+
+    @cached_property
+    def parse_lines(self) -> ParseLines:
+        if parse_lines := self.backend.get('parse_lines'):
+            return parse_lines
+        parse = next(iter(self.rules.values())).parse_into_messages
+        return lambda lines: parse(''.join(lines))
 
     @cached_property
     def rules(self) -> dict[str, Rule]:
@@ -88,50 +252,355 @@ class Fixo:
 
         return {r: rules[r] for r in args().rules}
 
+    @cached_property
+    def priority(self) -> list[str]:
+        """Rule names, highest priority first: by default, the order of the rules"""
+        return list(args().priority or self.rules)
+
     def _execute(self) -> None:
         (file,) = args().files
         data = json.loads(file.read_text())
         edits = {k: [type_edit.TypeEdit(**i) for i in v] for k, v in data.items()}
-        self._edit(edits)
+        self._check_files(edits)
+        self._apply(edits.items())
+
+    def _choose(self) -> None:
+        if len(args().files) != 2:
+            raise FixoError('--tui needs an edits file and a file to write to')
+        file, output = args().files
+        try:
+            tui.choose(file, output)
+        except (ImportError, ValueError) as e:
+            raise FixoError(e.args[0]) from None
+
+    def _select(self) -> None:
+        (file,) = args().files
+        edit_store = store.EditStore(file)
+        where = args().where
+        try:
+            if args().mark:
+                count = edit_store.mark(store.Status(args().mark), where)
+                _err(f'{count} edits marked {args().mark}')
+            elif args().diff or args().edit_immediately:
+                self._check_files(edit_store.files(where, store.Status.accepted))
+                self._apply(edit_store.accepted(where))
+            else:
+                for row in edit_store.select(where):
+                    print(json.dumps(row))
+        finally:
+            edit_store.close()
+
+    def _apply(self, file_edits: Iterable[FileItem]) -> None:
+        self._start('diff' if args().diff else 'edit', file_edits)
+        file_edits = self._merge(file_edits)
+        if args().diff:
+            self._diff(file_edits)
+        else:
+            self._edit(file_edits)
+        self._finish()
+
+    @cached_property
+    def prefilter(self) -> Prefilter | None:
+        return Prefilter.create(self.rules.values()) if args().prefilter else None
+
+    @cached_property
+    def public(self) -> PublicApi | None:
+        return PublicApi() if args().public else None
+
+    @cached_property
+    def files(self) -> list[Path]:
+        """The files or directories to check, narrowed by the prefilter if any.
+
+        Only a type checker's command line is narrowed: a scan reads each file once
+        anyway, and the pipeline prefilters it then.
+        """
+        if self.prefilter is None or 'scan_file' in self.backend:
+            return args().files
+
+        pruned: list[Path] = []
+        files = list(self.prefilter.files(python_files(args().files), pruned))
+        _err(f'prefilter: pruned {len(pruned)} of {len(files) + len(pruned)} files')
+        if sum(len(str(f)) + 1 for f in files) > MAX_COMMAND_CHARS:
+            # Too many files to list, so the checker expands the directories itself
+            _err('prefilter: too many files for the command line, checking them all')
+            return args().files
+        return files
 
     def _find(self) -> None:
-        tc = args().type_completeness  # or
+        budget = None
+        if args().max_memory:
+            budget = MemoryBudget(args().max_memory)
+
+        pipeline = Pipeline(
+            self.rules,
+            self.parse_lines,
+            executor=self.executor,
+            write=args().edit_immediately,
+            workers=args().workers,
+            priority=self.priority,
+            verbose=args().verbose,
+            grouped=self.backend.get('grouped_by_file', False),
+            scan=self.backend.get('scan_file'),
+            prefilter=self.prefilter,
+            public=self.public,
+            journal=self.journal,
+            cache=args().cache and RuleCache(args().cache),
+            source=self.source,
+            budget=budget,
+            progress=self.progress,
+            # The fixed point needs every edit from the first round
+            flush=self._output if budget and not args().until_fixed_point else None,
+        )
+        # Files from a --revision are not pruned by the prefilter in the working tree
+        files = args().files if self.source else self.files
+        start = time.perf_counter()
+        edits = self._find_round(pipeline, files, first=True)
+        if args().until_fixed_point:
+            secs = time.perf_counter() - start
+            edits = self._fixed_point(pipeline, files, edits, secs)
+        self._finish()
+
+        if pipeline.pruned:
+            _err(f'prefilter: pruned {pipeline.pruned} files with messages')
+        if removed := pipeline.dedupe.removed:
+            _err(f'{removed} duplicate messages removed')
+
+        if budget is not None:
+            _err(f'memory: {budget}')
+
+        self._output(edits)
+        self._end_output()
 
+    @cached_property
+    def symbol_index(self) -> SymbolIndex:
+        return SymbolIndex(args().index)
+
+    def _index(self) -> None:
+        start = time.perf_counter()
+        update = self.symbol_index.update(python_files(args().files))
+        for file, error in update.errors.items():
+            _err(f'ERROR: {file}: {error}')
+        _err(f'index: {update}, {time.perf_counter() - start:.3f}s')
+
+        if args().where:
+            for row in self.symbol_index.select(args().where):
+                print(json.dumps(row))
+            return
+
+        found = self.symbol_index.edits(self.rules, public=self.public)
+        edits = dict(self._merge(found.items()))
+        if args().edit_immediately:
+            self._start('edit', edits)
+            self._edit(edits.items())
+            self._finish()
+        else:
+            self._output(edits)
+            self._end_output()
+
+    @cached_property
+    def edit_store(self) -> store.EditStore:
+        return store.EditStore(args().store)
+
+    def _end_output(self) -> None:
+        if args().store:
+            _err(f'{self._stored} new edits stored in {args().store}')
+        elif not (args().diff or args().lintrunner or args().edit_immediately):
+            print('\n}' if self._json_files else '{}')
+
+    def _output(self, edits: FileEdits) -> None:
+        """Write out edits that were found: called for each batch with --max-memory"""
+        if args().diff:
+            self._diff(edits.items())
+        elif args().lintrunner:
+            for message in lint(
+                edits.items(), self.executor, self.source, self._missing
+            ):
+                print(json.dumps(message))
+        elif args().store:
+            self._stored += self.edit_store.add(edits.items())
+        elif not args().edit_immediately:
+            # One JSON object, written a file at a time. The pipeline puts all of
+            # a file's messages in one batch, so no file is written twice.
+            for file, file_edits in edits.items():
+                entry = json.dumps({file: [i.asdict() for i in file_edits]}, indent=4)
+                sys.stdout.write((',' if self._json_files else '{') + entry[1:-2])
+                self._json_files += 1
+
+    def _find_round(
+        self,
+        pipeline: Pipeline,
+        files: Sequence[Path],
+        first: bool = False,
+        only: Collection[str] | None = None,
+    ) -> FileEdits:
+        """Find edits in `files`, or if `only` is set, only in those of its files.
+
+        Checkers that take a list of files only check those in `only`, but some,
+        like `pyright --verifytypes`, take a whole package and still check all of
+        `files`.
+        """
+        tc = args().type_completeness
+        if pipeline.scan is not None:
+            if only is not None:
+                files = [Path(f) for f in sorted(only)]
+            if self.source is not None:
+                names = self.source.python_files([str(f) for f in files])
+            else:
+                names = (str(p) for p in python_files(files))
+            if self.progress is not None:
+                names = list(names)
+                self._start('scan', names)
+            return pipeline.run_files(names)
         if (p := Path(tc)).exists() and p.suffix == '.json':
-            results = p.read_text()
+            if first:
+                self._start('read report')
+                with p.open() as fp:
+                    return pipeline.run(fp)
+            # A saved report is out of date once files are edited
+            tc = ''
+        if only is not None and not self.backend.get('checks_package', False):
+            files = [Path(f) for f in sorted(only)]
+            only = None
+        if not files:
+            return {}
+        tc = tc or self.backend['type_command_string']
+        self._start('check')
+        return pipeline.run(self.stream((*shlex.split(tc), *map(str, files))), only)
+
+    def _fixed_point(
+        self, pipeline: Pipeline, files: Sequence[Path], edits: FileEdits, secs: float
+    ) -> FileEdits:
+        """Re-check only the files that were edited in the last round, until a round
+        finds no edits that were not already made, or the rounds run out.
+        """
+        seen = {f: set(e) for f, e in edits.items()}
+        changed = sorted(edits)
+        count = sum(len(e) for e in edits.values())
+        self._log(f'round 1: {count} edits in {len(changed)} files, {secs:.3f}s')
+
+        for n in range(2, args().until_fixed_point + 1):
+            if not changed:
+                break
+            start = time.perf_counter()
+            found = self._find_round(pipeline, files, only=set(changed))
+            changed, count = [], 0
+            for file, file_edits in found.items():
+                done = seen.setdefault(file, set())
+                if new := [e for e in file_edits if e not in done]:
+                    done.update(new)
+                    edits.setdefault(file, []).extend(new)
+                    changed.append(file)
+                    count += len(new)
+            secs = time.perf_counter() - start
+            self._log(f'round {n}: {count} edits in {len(changed)} files, {secs:.3f}s')
         else:
-            results = self.run((*shlex.split(tc), *args().files))
+            if changed:
+                self._log(f'Stopped after {args().until_fixed_point} rounds')
 
-        first_rule = next(iter(self.rules.values()))
-        file_messages = first_rule.file_messages(results)
-        edits = {k: list(v.edits(file_messages)) for k, v in self.rules.items()}
+        return edits
 
-        if args().edit_immediately:
-            self._edit(edits)
+    def _start(self, stage: str, items: Iterable[Any] = ()) -> None:
+        """Start a stage of the progress report, if there is one: `items` are the
+        files it will go through, which are counted if they can be
+        """
+        if self.progress is not None:
+            self.progress.start(stage, len(items) if isinstance(items, Sized) else 0)
+
+    def _finish(self) -> None:
+        if self.progress is not None:
+            self.progress.finish()
+
+    def _missing(self, file: str) -> None:
+        self._log(f'ERROR: {file}:', MISSING)
+
+    def _log(self, *args: Any) -> None:
+        """Print to stderr, around the progress report if there is one"""
+        if self.progress is not None:
+            self.progress.print(*args)
         else:
-            edits_json = {k: [i.asdict() for i in v] for k, v in edits.items()}
-            print(json.dumps(edits_json, indent=4))
+            _err(*args)
 
-    def _edit(self, edit_dict: dict[str, list[type_edit.TypeEdit]]) -> None:
-        path_to_edits = {Path(k): v for k, v in edit_dict.items()}
-        if nonexistent := [p for p in path_to_edits if not p.exists()]:
+    def _check_files(self, files: Iterable[str]) -> None:
+        if nonexistent := [f for f in files if not Path(f).exists()]:
             raise FixoError(f'{nonexistent=}')
-        for p, edits in path_to_edits.items():
-            try:
-                p.write_text(type_edit.perform_type_edits(edits, PythonFile(path=p)))
-            except Exception as e:
-                _err(f'ERROR: {p}:', *e.args)
-                if args().verbose:
-                    import traceback
-
-                    traceback.print_exc()
-            else:
-                _err(f'{p}: {len(edits)}')
+
+    def _merge(self, file_edits: Iterable[FileItem]) -> Iterator[FileItem]:
+        for file, edits in file_edits:
+            merged, collisions = merge(file, edits, self.priority)
+            for c in collisions:
+                self._log('COLLISION:', c)
+            yield file, merged
+
+    def _diff(self, file_edits: Iterable[FileItem]) -> None:
+        for d in diffs(file_edits, self.executor, self.source, self._missing):
+            sys.stdout.write(d)
+            if self.progress is not None:
+                self.progress.advance()
+
+    def _edit(self, file_edits: Iterable[FileItem]) -> None:
+        """Render and verify every file, then write the ones that passed.
+
+        A file fails if it no longer compiles, or loses or renames a block, or
+        changes more than annotations and imports. Failed files are left as they
+        were, and are reported before anything is written.
+        """
+        journal = self.journal
+        todo: list[FileItem] = []
+        for file, edits in file_edits:
+            key = journal.key(file, edits) if journal else ''
+            if journal is not None and key in journal.done:
+                if not journal.verify(file):
+                    self._log(f'ERROR: {file}:', CHANGED)
+                if self.progress is not None:
+                    self.progress.advance(edits=len(edits))
+                continue
+            todo.append((file, edits))
+
+        # Only the temporary file names and the failures are kept in memory
+        checked = list(check_files(todo, self.executor))
+        report(checked, self._log, args().verbose)
+
+        try:
+            for c, (file, edits) in zip(checked, todo):
+                if self.progress is not None:
+                    self.progress.advance(edits=len(edits))
+                if c.error:
+                    continue
+                try:
+                    c.replace()
+                    if journal is not None:
+                        journal.record(
+                            journal.key(file, edits), file, edits, written=True
+                        )
+                except Exception as e:
+                    self._log(f'ERROR: {file}:', *e.args)
+                    if args().verbose:
+                        import traceback
+
+                        traceback.print_exc()
+                else:
+                    self._log(f'{file}: {len(edits)}')
+        finally:
+            # Remove the temporary files that were not moved into place
+            for c in checked:
+                c.discard()
+
+    def stream(self, cmd: Sequence[str]) -> Iterator[str]:
+        """Run a subprocess and yield lines of stdout as they arrive"""
+        if args().verbose:
+            _err('$', *cmd)
+
+        with subprocess.Popen(cmd, text=True, stdout=subprocess.PIPE) as p:
+            assert p.stdout is not None
+            yield from p.stdout
+
+        if p.returncode:
+            raise subprocess.CalledProcessError(p.returncode, cmd)
 
     def run(self, cmd: str | Sequence[str], check: bool = True, **kwargs: Any) -> str:
         """Run a subprocess and return stdout as a string"""
         if args().verbose:
-            print('$', *([cmd] if isinstance(cmd, str) else cmd))
+            _err('$', *([cmd] if isinstance(cmd, str) else cmd))
 
         shell = kwargs.get('shell', False)
         if shell and not isinstance(cmd, str):
@@ -142,7 +611,6 @@ class Fixo:
         p = subprocess.run(cmd, text=True, capture_output=True, **kwargs)
 
         if args().verbose or (check and p.returncode):
-            # TODO: Fix this output for lintrunner mode
             print(p.stdout[:MAX_ERROR_CHARS], file=sys.stderr)
             error = p.stderr if p.returncode else p.stderr[:MAX_ERROR_CHARS]
             print(error, file=sys.stderr)
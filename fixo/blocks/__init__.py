@@ -13,6 +13,7 @@ __all__ = [
     'ParseError',
     'PythonFile',
     'is_empty',
+    'split_lines',
 ]
 
 NO_TOKEN = -1
@@ -35,5 +36,18 @@ def is_empty(t: TokenInfo) -> bool:
     return t.type in _EMPTY_TOKENS
 
 
+def split_lines(text: str) -> list[str]:
+    """Split text into lines ending with \n, as the tokenizer does.
+
+    `str.splitlines()` also splits at characters like \f or a lone \r, which would
+    make line numbers disagree with the tokens'.
+    """
+    lines = [line + '\n' for line in text.split('\n')]
+    lines[-1] = lines[-1][:-1]
+    if not lines[-1]:
+        lines.pop()
+    return lines
+
+
 from .block import Block  # noqa: E402
 from .python_file import PythonFile  # noqa: E402
@@ -1,14 +1,20 @@
 from __future__ import annotations
 
 import dataclasses as dc
+import hashlib
 import itertools
+import re
 import token
+from array import array
 from enum import Enum
-from functools import cached_property, total_ordering
+from functools import total_ordering
 from typing import TYPE_CHECKING, Any
 
 from typing_extensions import Self
 
+from ..concurrency import cached_property
+from . import NO_TOKEN
+
 if TYPE_CHECKING:
     from collections.abc import Iterator, Sequence
     from tokenize import TokenInfo
@@ -17,54 +23,105 @@ if TYPE_CHECKING:
 _OVERRIDES = {'@override', '@typing_extensions.override', '@typing.override'}
 
 
+@dc.dataclass(frozen=True)
+class Param:
+    name: str
+
+    # The index of the token with the name of the parameter
+    index: int
+
+    annotated: bool
+
+
+# Bits in `BlockTable.flags`
+IS_LOCAL = 1
+IS_METHOD = 2
+
+NO_PARENT = -1
+
+
 @total_ordering
-@dc.dataclass
 class Block:
-    """A block of Python code starting with either `def` or `class`"""
+    """A block of Python code starting with either `def` or `class`.
+
+    A Block is a view of one row of its file's BlockTable, and holds nothing else.
+    """
+
+    __slots__ = 'index', 'table'
 
     class Category(str, Enum):
         CLASS = 'class'
         DEF = 'def'
 
-    category: Category
+    def __init__(self, table: BlockTable, index: int) -> None:
+        self.table = table
 
-    # The sequence of tokens that contains this Block.
-    # Tokens are represented in `Block` as indexes into `self.tokens`
-    tokens: Sequence[TokenInfo] = dc.field(repr=False)
+        # The index of this block within the full list of blocks in the file
+        self.index = index
 
-    # The name of the function or class being defined
-    name: str
+    def __repr__(self) -> str:
+        return (
+            f'Block(category={self.category}, name={self.name!r}, begin={self.begin}, '
+            f'end={self.end}, full_name={self.full_name!r}, index={self.index})'
+        )
 
-    # The index of the very first token in the block (the "class" or "def" keyword)
-    begin: int
+    @property
+    def tokens(self) -> Sequence[TokenInfo]:
+        """The sequence of tokens that contains this Block"""
+        return self.table.tokens
 
-    # The index of the last token for this block
-    end: int
+    @property
+    def category(self) -> Block.Category:
+        return CATEGORIES[self.table.category[self.index]]
 
-    # The docstring for the block
-    docstring: str
+    @property
+    def name(self) -> str:
+        """The name of the function or class being defined"""
+        return self.table.names[self.index]
 
-    # These next members only get filled in after all blocks have been constructed
-    # and figure out family ties
+    @property
+    def begin(self) -> int:
+        """The index of the very first token in the block (the "class" or "def")"""
+        return self.table.begin[self.index]
 
-    # The full qualified name of the block within the file.
-    # This is the name of this block and all its parents, joined with `.`.
-    full_name: str = ''
+    @property
+    def end(self) -> int:
+        """The index of the last token for this block"""
+        return self.table.end[self.index]
 
-    # The index of this block within the full list of blocks in the file
-    index: int = 0
+    @property
+    def docstring(self) -> str:
+        i = self.table.docstring[self.index]
+        return '' if i == NO_TOKEN else self.tokens[i].string
 
-    # Is this block contained within a function definition?
-    is_local: bool = dc.field(default=False, repr=False)
+    @property
+    def full_name(self) -> str:
+        """The full qualified name of the block within the file.
 
-    # Is this block a function definition in a class definition?
-    is_method: bool = dc.field(default=False, repr=False)
+        This is the name of this block and all its parents, joined with `.`.
+        """
+        return self.table.full_names[self.index]
 
-    # A block index to the parent of this block, or None for a top-level block.
-    parent: int | None = None
+    @property
+    def is_local(self) -> bool:
+        """Is this block contained within a function definition?"""
+        return bool(self.table.flags[self.index] & IS_LOCAL)
 
-    # A list of block indexes for the children
-    children: list[int] = dc.field(default_factory=list)
+    @property
+    def is_method(self) -> bool:
+        """Is this block a function definition in a class definition?"""
+        return bool(self.table.flags[self.index] & IS_METHOD)
+
+    @property
+    def parent(self) -> int | None:
+        """A block index to the parent of this block, or None for a top-level block"""
+        p = self.table.parent[self.index]
+        return None if p == NO_PARENT else p
+
+    @property
+    def children(self) -> list[int]:
+        """A list of block indexes for the children, and their children, and so on"""
+        return list(self.table.descendants(self.index))
 
     @property
     def start_line(self) -> int:
@@ -85,7 +142,7 @@ class Block:
 
     @property
     def is_class(self) -> bool:
-        return self.category == Block.Category.CLASS
+        return self.table.is_class(self.index)
 
     @property
     def display_name(self) -> str:
@@ -93,16 +150,47 @@ class Block:
         ending = '' if self.is_class else '()'
         return f'{self.category.value} {self.full_name}{ending}'
 
-    @cached_property
+    @property
     def decorators(self) -> list[str]:
         """A list of decorators for this function or method.
 
         Each decorator both the @ symbol and any arguments to the decorator
         but no extra whitespace.
         """
-        return _get_decorators(self.tokens, self.begin)
+        cache = self.table.decorators
+        if (d := cache.get(self.index)) is None:
+            d = cache[self.index] = _get_decorators(self.tokens, self.begin)
+        return d
 
-    @cached_property
+    @property
+    def signature(self) -> tuple[list[Param], bool]:
+        """The parameters of a function, and whether it has a return annotation"""
+        if self.is_class:
+            return [], False
+        cache = self.table.signatures
+        if (s := cache.get(self.index)) is None:
+            s = cache[self.index] = _get_signature(self.tokens, self.begin)
+        return s
+
+    @property
+    def params(self) -> list[str]:
+        """The names of the parameters of a function, in order"""
+        return [p.name for p in self.signature[0]]
+
+    @property
+    def fingerprint(self) -> str:
+        """A short hash of the signature, which does not change when other blocks are
+        added or removed, or when this block's body or annotations change.
+        """
+        cache = self.table.fingerprints
+        if (f := cache.get(self.index)) is None:
+            name = _INDEX_RE.sub('', self.full_name)
+            parts = self.category.value, name, *self.decorators, '(', *self.params
+            f = hashlib.blake2b(' '.join(parts).encode(), digest_size=8).hexdigest()
+            cache[self.index] = f
+        return f
+
+    @property
     def is_override(self) -> bool:
         return not self.is_class and bool(_OVERRIDES.intersection(self.decorators))
 
@@ -135,17 +223,79 @@ class Block:
 
     def __eq__(self, o: object) -> bool:
         assert isinstance(o, Block)
-        return o.tokens is self.tokens and o.index == self.index
+        return o.table is self.table and o.index == self.index
 
     def __hash__(self) -> int:
-        return super().__hash__()
+        return hash((id(self.table), self.index))
 
     def __lt__(self, o: Self) -> bool:
-        assert isinstance(o, Block) and o.tokens is self.tokens
+        assert isinstance(o, Block) and o.table is self.table
         return o.index < self.index
 
 
+CATEGORIES = list(Block.Category)
+_CLASS = CATEGORIES.index(Block.Category.CLASS)
+
+
+@dc.dataclass(eq=False)
+class BlockTable:
+    """The blocks of one file, as parallel arrays with one entry for each block.
+
+    Tokens are represented as indexes into `tokens`, and blocks as indexes into the
+    arrays. Names are interned, and docstrings are only read from their tokens when
+    they are asked for.
+    """
+
+    tokens: Sequence[TokenInfo] = dc.field(repr=False)
+
+    # The indexes of the first token ("class" or "def") and last token of each block
+    begin: array[int] = dc.field(default_factory=lambda: array('q'))
+    end: array[int] = dc.field(default_factory=lambda: array('q'))
+
+    # The index of the STRING token of each docstring, or NO_TOKEN
+    docstring: array[int] = dc.field(default_factory=lambda: array('q'))
+
+    # The index of the parent of each block, or NO_PARENT for a top-level block
+    parent: array[int] = dc.field(default_factory=lambda: array('l'))
+
+    # The index of the last block inside each block, or its own index if none is.
+    # Blocks are in file order, so a block's descendants are the blocks after it up
+    # to this one.
+    last: array[int] = dc.field(default_factory=lambda: array('l'))
+
+    # The index of each block's category in CATEGORIES
+    category: array[int] = dc.field(default_factory=lambda: array('B'))
+
+    # IS_LOCAL and IS_METHOD bits for each block
+    flags: array[int] = dc.field(default_factory=lambda: array('B'))
+
+    names: list[str] = dc.field(default_factory=list)
+    full_names: list[str] = dc.field(default_factory=list)
+
+    # Filled in the first time each block is asked, by Block
+    decorators: dict[int, list[str]] = dc.field(default_factory=dict, repr=False)
+    signatures: dict[int, tuple[list[Param], bool]] = dc.field(
+        default_factory=dict, repr=False
+    )
+    fingerprints: dict[int, str] = dc.field(default_factory=dict, repr=False)
+
+    def __len__(self) -> int:
+        return len(self.begin)
+
+    @cached_property
+    def blocks(self) -> list[Block]:
+        return [Block(self, i) for i in range(len(self))]
+
+    def is_class(self, i: int) -> bool:
+        return self.category[i] == _CLASS
+
+    def descendants(self, i: int) -> range:
+        """The indexes of all the blocks inside block `i`"""
+        return range(i + 1, self.last[i] + 1)
+
+
 _IGNORE = {token.COMMENT, token.DEDENT, token.INDENT, token.NL}
+_INDEX_RE = re.compile(r'\[\d+\]')
 
 
 def _get_decorators(tokens: Sequence[TokenInfo], block_start: int) -> list[str]:
@@ -170,3 +320,32 @@ def _get_decorators(tokens: Sequence[TokenInfo], block_start: int) -> list[str]:
     out = list(decorators())
     out.reverse()
     return out
+
+
+def _get_signature(
+    tokens: Sequence[TokenInfo], block_start: int
+) -> tuple[list[Param], bool]:
+    params: list[Param] = []
+    depth = 0
+    expect_name = False
+
+    def next_string(i: int) -> str:
+        it = (t for t in itertools.islice(tokens, i + 1, None) if t.type not in _IGNORE)
+        return next(it).string
+
+    for i in range(block_start, len(tokens)):
+        t = tokens[i]
+        if t.type == token.OP:
+            if t.string in ('(', '[', '{'):
+                depth += 1
+                expect_name = depth == 1
+            elif t.string in (')', ']', '}'):
+                if not (depth := depth - 1):
+                    return params, next_string(i) == '->'
+            elif depth == 1 and t.string == ',':
+                expect_name = True
+        elif t.type == token.NAME and expect_name:
+            params.append(Param(t.string, i, next_string(i) == ':'))
+            expect_name = False
+
+    return params, False
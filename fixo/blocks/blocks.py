@@ -1,70 +1,123 @@
 from __future__ import annotations
 
+import sys
 import token
 from typing import TYPE_CHECKING
 
-from . import is_empty
-from .block import Block
+from . import NO_TOKEN, is_empty
+from .block import CATEGORIES, IS_LOCAL, IS_METHOD, NO_PARENT, Block, BlockTable
 
 if TYPE_CHECKING:
-    from collections.abc import Sequence
+    from collections.abc import Iterable, Sequence
 
     from .python_file import PythonFile
 
 
 def blocks(pf: PythonFile) -> list[Block]:
-    blocks: list[Block] = []
+    return block_table(pf).blocks
+
+
+def block_table(pf: PythonFile) -> BlockTable:
+    table = BlockTable(pf.tokens)
 
     starts_block = ('class', 'def').__contains__
-    it = (i for i, t in enumerate(pf.tokens) if starts_block(t.string))
-    blocks = [_make_block(pf, i) for i in it]
-
-    for i, parent in enumerate(blocks):
-        for j in range(i + 1, len(blocks)):
-            if parent.contains(child := blocks[j]):
-                child.parent = i
-                parent.children.append(j)
-            else:
+    for begin in (i for i, t in enumerate(pf.tokens) if starts_block(t.string)):
+        end, name, docstring = _scan_block(pf, begin)
+        category = Block.Category[pf.tokens[begin].string.upper()]
+        table.begin.append(begin)
+        table.end.append(end)
+        table.docstring.append(docstring)
+        table.category.append(CATEGORIES.index(category))
+        table.names.append(sys.intern(name))
+
+    _add_family(table)
+    table.full_names.extend([''] * len(table))
+    _add_full_names(table, [i for i, p in enumerate(table.parent) if p == NO_PARENT])
+    return table
+
+
+def moved_table(table: BlockTable, pf: PythonFile, begins: Iterable[int]) -> BlockTable:
+    """The same blocks in `pf`, where each now begins at the token in `begins`.
+
+    Only the token indexes are found again: the family ties and names are shared.
+    """
+    new = BlockTable(
+        pf.tokens,
+        parent=table.parent,
+        last=table.last,
+        category=table.category,
+        flags=table.flags,
+        names=table.names,
+        full_names=table.full_names,
+    )
+    for begin in begins:
+        end, _, docstring = _scan_block(pf, begin)
+        new.begin.append(begin)
+        new.end.append(end)
+        new.docstring.append(docstring)
+    return new
+
+
+def _add_family(table: BlockTable) -> None:
+    # A block's parent is the innermost block before it that contains it. Blocks
+    # are in file order, so the blocks which might still contain the next one
+    # are a stack.
+    tokens, begin, end = table.tokens, table.begin, table.end
+    stack: list[int] = []
+
+    for i in range(len(table)):
+        start_line, end_line = tokens[begin[i]].start[0], tokens[end[i]].start[0]
+        while stack:
+            p = stack[-1]
+            if tokens[begin[p]].start[0] < start_line and (
+                tokens[end[p]].start[0] >= end_line
+            ):
                 break
+            table.last[p] = i - 1
+            stack.pop()
 
-    for i, b in enumerate(blocks):
-        b.index = i
-        parents = [b]
-        while (p := parents[-1].parent) is not None:
-            parents.append(blocks[p])
-        parents = parents[1:]
+        parent = stack[-1] if stack else NO_PARENT
+        flags = 0
+        if parent != NO_PARENT:
+            if table.flags[parent] & IS_LOCAL or not table.is_class(parent):
+                flags |= IS_LOCAL
+            if table.is_class(parent) and not table.is_class(i):
+                flags |= IS_METHOD
 
-        b.is_local = not all(p.is_class for p in parents)
-        b.is_method = not b.is_class and bool(parents) and parents[0].is_class
+        table.parent.append(parent)
+        table.last.append(i)
+        table.flags.append(flags)
+        stack.append(i)
 
-    _add_full_names(blocks, [b for b in blocks if b.parent is None])
-    return blocks
+    for p in stack:
+        table.last[p] = len(table) - 1
 
 
 def _add_full_names(
-    blocks: Sequence[Block],
-    children: Sequence[Block],
-    prefix: str = '',
+    table: BlockTable, children: Sequence[int], prefix: str = ''
 ) -> None:
     # Would be trivial except that there can be duplicate names at any level
-    dupes: dict[str, list[Block]] = {}
-    for b in children:
-        dupes.setdefault(b.name, []).append(b)
+    dupes: dict[str, list[int]] = {}
+    for i in children:
+        dupes.setdefault(table.names[i], []).append(i)
 
     for dl in dupes.values():
-        for i, b in enumerate(dl):
-            suffix = f'[{i + 1}]' if len(dl) > 1 else ''
-            b.full_name = prefix + b.name + suffix
+        for n, i in enumerate(dl):
+            suffix = f'[{n + 1}]' if len(dl) > 1 else ''
+            table.full_names[i] = prefix + table.names[i] + suffix
 
-    for b in children:
-        if kids := [blocks[i] for i in b.children]:
-            _add_full_names(blocks, kids, b.full_name + '.')
+    for i in children:
+        if kids := table.descendants(i):
+            _add_full_names(table, kids, table.full_names[i] + '.')
 
 
-def _make_block(pf: PythonFile, begin: int) -> Block:
+def _scan_block(pf: PythonFile, begin: int) -> tuple[int, str, int]:
+    """The index of the last token, the name, and the index of the docstring token
+    of the block beginning at token `begin`
+    """
     end = 0
     name = ''
-    docstring = ''
+    docstring = NO_TOKEN
 
     for i in range(begin + 1, len(pf.tokens)):
         t = pf.tokens[i]
@@ -79,17 +132,9 @@ def _make_block(pf: PythonFile, begin: int) -> Block:
                 end = i
 
         elif t.type == token.STRING:
-            docstring = t.string
+            docstring = i
             break
         elif is_empty(t):
             break
 
-    category = Block.Category[pf.tokens[begin].string.upper()]
-    return Block(
-        begin=begin,
-        category=category,
-        docstring=docstring,
-        end=end,
-        name=name,
-        tokens=pf.tokens,
-    )
+    return end, name, docstring
@@ -0,0 +1,254 @@
+"""Update a PythonFile after TokenEdits without tokenizing and parsing all of it again.
+
+The TokenEdits made by TypeEdits insert annotations and whole import statements, so
+they only change the logical lines they are inserted into, and never add or remove
+blocks or change indentation. Only those logical lines are tokenized again: every
+other token just moves down by the number of lines inserted above it.
+"""
+
+from __future__ import annotations
+
+import dataclasses as dc
+import re
+import token
+from bisect import bisect_left, bisect_right
+from tokenize import TokenInfo, generate_tokens
+from typing import TYPE_CHECKING
+
+from ..token_edit import insert_position, insert_texts, perform_edits
+from . import split_lines
+from .blocks import moved_table
+from .imports import Import
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Sequence
+
+    from ..token_edit import TokenEdit
+    from .python_file import PythonFile
+
+# Files with line continuations or unusual whitespace are rare, and are simplest to
+# tokenize again in full.
+_UNSTABLE = re.compile(r'\\\r?\n|[\t\v\f\x1c-\x1e\x85\u2028\u2029]')
+
+_new_token = tuple.__new__
+
+_STRUCTURE = token.INDENT, token.DEDENT
+_NOT_CODE = token.COMMENT, token.NL
+
+
+def patch(pf: PythonFile, edits: Iterable[TokenEdit]) -> PythonFile:
+    """Return `pf` with the edits performed, re-tokenizing only the logical lines
+    they touch.
+
+    The contents are the same as `perform_edits` would give. If the edits turn
+    out not to be local, the result is parsed lazily like any other PythonFile.
+    """
+    edits = list(edits)
+    texts: dict[int, dict[str, None]] = {}
+    for e in edits:
+        texts.setdefault(e.position, {}).setdefault(e.text, None)
+
+    if texts and not _UNSTABLE.search(pf.contents):
+        if (regions := _regions(pf.tokens, texts)) is not None:
+            if new := _Patch(pf, regions).apply():
+                return new
+    return pf.with_contents(perform_edits(edits, pf.tokens, pf.lines))
+
+
+@dc.dataclass
+class _Region:
+    """A logical line that gets insertions, with any comments and blank lines
+    just before it
+    """
+
+    # The indexes of its first and last old tokens
+    begin: int
+    end: int
+
+    # Its first and last old line numbers
+    first_row: int
+    last_row: int
+
+    # The (line number, column, text) of each insertion, in order
+    inserts: list[tuple[int, int, str]] = dc.field(default_factory=list)
+
+    # The index of its first new token, filled in by `_Patch`
+    new_begin: int = 0
+
+    # Maps old token indexes to new ones, relative to `begin` and `new_begin`
+    index_map: dict[int, int] = dc.field(default_factory=dict)
+
+    @property
+    def inserted(self) -> int:
+        """The number of lines inserted"""
+        return sum(text.count('\n') for *_, text in self.inserts)
+
+
+def _regions(
+    tokens: Sequence[TokenInfo], texts: dict[int, dict[str, None]]
+) -> list[_Region] | None:
+    regions: dict[int, _Region] = {}
+    for position in sorted(texts):
+        begin = position
+        while begin and tokens[begin - 1].type != token.NEWLINE:
+            begin -= 1
+        if not (r := regions.get(begin)):
+            it = range(position, len(tokens))
+            end = next((i for i in it if tokens[i].type == token.NEWLINE), -1)
+            if end < 0:
+                return None  # Inserting after the last statement
+            first_row = tokens[begin - 1].start[0] + 1 if begin else 1
+            r = regions[begin] = _Region(begin, end, first_row, tokens[end].start[0])
+
+        row, col = insert_position(tokens, position)
+        r.inserts.extend((row, col, text) for text in texts[position])
+
+    return list(regions.values())
+
+
+class _Patch:
+    def __init__(self, pf: PythonFile, regions: list[_Region]) -> None:
+        self.pf = pf
+        self.regions = regions
+        self.imports: list[Import] = []
+
+        # For bisecting old token indexes and old line numbers
+        self.begins = [r.begin for r in self.regions]
+        self.last_rows = [r.last_row for r in self.regions]
+        self.row_shifts = [0]
+        for r in self.regions:
+            self.row_shifts.append(self.row_shifts[-1] + r.inserted)
+
+    def apply(self) -> PythonFile | None:
+        """Return the new PythonFile, or None if the edits aren't local"""
+        if (result := self._lines_and_tokens()) is None:
+            return None
+
+        pf = self.pf
+        lines, tokens = result
+        self.new = new = pf.with_contents(''.join(lines))
+        vars(new).update(lines=lines, tokens=tokens)
+        vars(new)['indent_to_dedent'] = {
+            self._index(i): self._index(j) for i, j in pf.indent_to_dedent.items()
+        }
+
+        kept = (i for i in pf.imports if not self._in_region(i.line_number))
+        imports = [dc.replace(i, line_number=self._row(i.line_number)) for i in kept]
+        imports.extend(self.imports)
+        vars(new)['imports'] = sorted(imports, key=lambda i: i.line_number)
+
+        begins = (self._index(i) for i in pf.block_table.begin)
+        table = vars(new)['block_table'] = moved_table(pf.block_table, new, begins)
+        vars(new)['blocks'] = table.blocks
+        return new
+
+    def _lines_and_tokens(self) -> tuple[list[str], list[TokenInfo]] | None:
+        old_lines, old_tokens = self.pf.lines, self.pf.tokens
+        lines: list[str] = []
+        tokens: list[TokenInfo] = []
+        row = index = 0
+
+        for r, shift in zip(self.regions, self.row_shifts):
+            lines.extend(old_lines[row : r.first_row - 1])
+            region_lines = _insert(old_lines[r.first_row - 1 : r.last_row], r)
+            row_offset = len(lines)
+            lines.extend(region_lines)
+
+            tokens.extend(_move(t, shift) for t in old_tokens[index : r.begin])
+            r.new_begin = len(tokens)
+            if (region := self._tokenize(r, region_lines, row_offset)) is None:
+                return None
+            tokens.extend(region)
+            row, index = r.last_row, r.end + 1
+
+        lines.extend(old_lines[row:])
+        tokens.extend(_move(t, self.row_shifts[-1]) for t in old_tokens[index:])
+        return lines, tokens
+
+    def _tokenize(
+        self, r: _Region, lines: Sequence[str], row_offset: int
+    ) -> list[TokenInfo] | None:
+        old = self.pf.tokens[r.begin : r.end + 1]
+        tokens = [_move(t, row_offset) for t in generate_tokens(iter(lines).__next__)]
+        while tokens and tokens[-1].type in (token.DEDENT, token.ENDMARKER):
+            tokens.pop()
+
+        # INDENT and DEDENT depend on the lines before the region, so the old ones
+        # are moved to just before its first token of code, where they belong
+        first = next(i for i, t in enumerate(tokens) if t.type not in _NOT_CODE)
+        if tokens[first].type == token.INDENT:
+            tokens.pop(first)
+        code = tokens[first]
+        old_code = next(t for t in old if t.type not in (*_NOT_CODE, *_STRUCTURE))
+        if code.start[1] != old_code.start[1]:
+            return None
+        if any(t.type in _STRUCTURE for t in tokens):
+            return None
+        if len(_block_starts(old)) != len(_block_starts(tokens)):
+            return None  # A block was added
+
+        (row, _), line = code.start, code.line
+        tokens[first:first] = (
+            t._replace(start=(row, t.start[1]), end=(row, t.end[1]), line=line)
+            for t in old
+            if t.type in _STRUCTURE
+        )
+
+        # Only these tokens are ever looked up by index from outside the region
+        def targets(ts: Sequence[TokenInfo]) -> list[int]:
+            structure = [i for i, t in enumerate(ts) if t.type in _STRUCTURE]
+            return structure + _block_starts(ts)
+
+        r.index_map = dict(zip(targets(old), targets(tokens)))
+
+        statements: list[list[TokenInfo]] = [[]]
+        for t in tokens:
+            if t.type not in _NOT_CODE:
+                statements[-1].append(t)
+                if t.type == token.NEWLINE:
+                    statements.append([])
+        self.imports.extend(i for s in statements for i in Import.create(s))
+        return tokens
+
+    def _index(self, i: int) -> int:
+        """Map an old token index to a new one"""
+        if (k := bisect_right(self.begins, i) - 1) < 0:
+            return i
+        r = self.regions[k]
+        if i <= r.end:
+            return r.new_begin + r.index_map[i - r.begin]
+
+        # Tokens between regions all move by the same amount
+        if k + 1 < len(self.regions):
+            after = self.regions[k + 1]
+            return i + after.new_begin - after.begin
+        return i + len(self.new.tokens) - len(self.pf.tokens)
+
+    def _in_region(self, row: int) -> bool:
+        k = bisect_left(self.last_rows, row)
+        return k < len(self.regions) and self.regions[k].first_row <= row
+
+    def _row(self, row: int) -> int:
+        """Map an old line number outside every region to a new one"""
+        return row + self.row_shifts[bisect_left(self.last_rows, row)]
+
+
+def _insert(lines: Sequence[str], r: _Region) -> list[str]:
+    return split_lines(insert_texts(lines, r.inserts, r.first_row))
+
+
+def _move(t: TokenInfo, rows: int) -> TokenInfo:
+    if not rows:
+        return t
+    type_, string, (r1, c1), (r2, c2), line = t
+    # Much faster than `t._replace()`, which matters as it is called for most tokens
+    return _new_token(
+        TokenInfo, (type_, string, (r1 + rows, c1), (r2 + rows, c2), line)
+    )
+
+
+def _block_starts(tokens: Sequence[TokenInfo]) -> list[int]:
+    is_start = ('class', 'def').__contains__
+    return [
+        i for i, t in enumerate(tokens) if t.type == token.NAME and is_start(t.string)
+    ]
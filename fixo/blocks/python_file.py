@@ -1,27 +1,40 @@
 from __future__ import annotations
 
+import mmap
+import os
 import token
-from functools import cached_property
+from array import array
 from pathlib import Path
-from tokenize import TokenInfo, generate_tokens
+from tokenize import TokenInfo, detect_encoding, generate_tokens, tokenize
 from typing import TYPE_CHECKING
 
 from typing_extensions import Self
 
-from . import ParseError, is_empty
+from ..concurrency import cached_property
+from . import ParseError, is_empty, split_lines
 from .imports import Import
 
 if TYPE_CHECKING:
-    from collections.abc import Sequence
+    from collections.abc import Iterable, Iterator, Sequence
 
-    from .block import Block
+    from ..token_edit import TokenEdit
+    from .block import Block, BlockTable
+
+# Smaller files are read, which is as fast as mapping them and never holds them open
+MMAP_MIN_SIZE = 1 << 20
 
 
 class PythonFile:
     linter_name: str
 
-    def __init__(self, path: Path, *, contents: str | None = None) -> None:
+    def __init__(
+        self, path: Path, *, contents: str | None = None, data: bytes | None = None
+    ) -> None:
+        """Either `contents` or the raw `data` of the file may be passed in,
+        otherwise the file at `path` is read when it is needed.
+        """
         self._contents = contents
+        self._data = data
         self._path = path
 
     def __repr__(self) -> str:
@@ -31,11 +44,58 @@ class PythonFile:
     def contents(self) -> str:
         if self._contents is not None:
             return self._contents
-        return self.path.read_text() if self._path else ''
+        return self.buffer[:].decode(self.encoding) if self._path else ''
+
+    @cached_property
+    def buffer(self) -> bytes | mmap.mmap:
+        """The raw bytes of the file, memory-mapped rather than read if it is large.
+
+        A mapped file must not be written until `close()` is called.
+        """
+        if self._data is not None:
+            return self._data
+        with self.path.open('rb') as fp:
+            if os.fstat(fp.fileno()).st_size < MMAP_MIN_SIZE:
+                return fp.read()
+            return mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self) -> None:
+        """Release the memory map of the file, if there is one"""
+        if isinstance(buffer := self.__dict__.pop('buffer', None), mmap.mmap):
+            buffer.close()
+
+    @cached_property
+    def encoding(self) -> str:
+        if self._contents is not None:
+            return 'utf-8'
+        lines = self._byte_lines()
+        return detect_encoding(lambda: next(lines, b''))[0]
+
+    @cached_property
+    def line_offsets(self) -> array[int]:
+        """The byte offset of the start of each line of the buffer, and of its end.
+
+        Line `n` (counting from 1 like tokens) is `buffer[offsets[n - 1]:offsets[n]]`
+        """
+        buf = self.buffer
+        offsets = array('q', [0])
+        while (i := buf.find(b'\n', offsets[-1])) != -1:
+            offsets.append(i + 1)
+        if offsets[-1] != len(buf):
+            offsets.append(len(buf))
+        return offsets
+
+    def line(self, n: int) -> str:
+        """Line `n` of the file, counting from 1, without reading the whole file"""
+        if 'lines' in self.__dict__ or self._contents is not None:
+            return self.lines[n - 1]
+        begin, end = self.line_offsets[n - 1], self.line_offsets[n]
+        return self.buffer[begin:end].decode(self.encoding)
 
     @cached_property
     def lines(self) -> list[str]:
-        return self.contents.splitlines(keepends=True)
+        """The lines of the file, split at \n like `line_offsets` and the tokens"""
+        return split_lines(self.contents)
 
     @cached_property
     def path(self) -> Path:
@@ -45,10 +105,27 @@ class PythonFile:
     def with_contents(self, contents: str) -> Self:
         return self.__class__(contents=contents, path=self._path)
 
+    def patched(self, edits: Iterable[TokenEdit]) -> PythonFile:
+        """This file with the edits performed, only re-tokenizing the lines edited"""
+        from .patch import patch
+
+        return patch(self, edits)
+
     @cached_property
     def tokens(self) -> list[TokenInfo]:
         """This file, tokenized. Raises IndentationError on badly indented code."""
-        return list(generate_tokens(iter(self.lines).__next__))
+        if self._contents is not None or not self._path or 'lines' in self.__dict__:
+            return list(generate_tokens(iter(self.lines).__next__))
+
+        # Tokenize straight from the buffer, without copying the whole file into
+        # `contents` and `lines` first.
+        lines = self._byte_lines()
+        tokens = tokenize(lambda: next(lines, b''))
+        return [t for t in tokens if t.type != token.ENCODING]
+
+    def _byte_lines(self) -> Iterator[bytes]:
+        buf, offsets = self.buffer, self.line_offsets
+        return (buf[offsets[i - 1] : offsets[i]] for i in range(1, len(offsets)))
 
     @cached_property
     def token_lines(self) -> list[list[TokenInfo]]:
@@ -120,10 +197,14 @@ class PythonFile:
         return [i for tl in self.token_lines for i in Import.create(tl)]
 
     @cached_property
-    def blocks(self) -> list[Block]:
-        from .blocks import blocks
+    def block_table(self) -> BlockTable:
+        from .blocks import block_table
+
+        return block_table(self)
 
-        return blocks(self)
+    @cached_property
+    def blocks(self) -> list[Block]:
+        return self.block_table.blocks
 
     @cached_property
     def blocks_by_line_number(self) -> dict[int, Block]:
@@ -135,6 +216,13 @@ class PythonFile:
     def blocks_by_name(self) -> dict[str, Block]:
         return {b.full_name: b for b in self.blocks}
 
+    @cached_property
+    def blocks_by_fingerprint(self) -> dict[str, list[Block]]:
+        result: dict[str, list[Block]] = {}
+        for b in self.blocks:
+            result.setdefault(b.fingerprint, []).append(b)
+        return result
+
     def block_name(self, line: int) -> str:
         block = self.blocks_by_line_number.get(line)
         return block.full_name if block else ''
@@ -159,10 +247,18 @@ class PythonFile:
 
 
 def is_public(*parts: str) -> bool:
-    # TODO: this rule is easy to understand but incomplete.
-    #
-    # What is missing is checking `__all__`: see
+    # This only looks at names: `fixo.public.PublicApi` also checks `__all__` and
+    # re-exports, see
     # https://github.com/pytorch/pytorch/wiki/Public-API-definition-and-documentation
 
     it = (s for p in parts for s in p.split('.'))
     return not any(i.startswith('_') and not i.startswith('__') for i in it)
+
+
+def python_files(paths: Iterable[Path]) -> Iterator[Path]:
+    """Yield the Python files in a list of files and directories"""
+    for p in paths:
+        if p.is_dir():
+            yield from sorted(p.rglob('*.py'))
+        else:
+            yield p
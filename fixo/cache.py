@@ -0,0 +1,48 @@
+"""An on-disk cache of the edits each rule made to each file.
+
+An entry is keyed by the rule's fingerprint, the hash of the file's contents and the
+messages for that file, so changing a rule or a file only recomputes what changed.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Any
+
+from .type_edit import TypeEdit
+
+
+def digest(*parts: Any) -> str:
+    return hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+
+
+class RuleCache:
+    """Each entry is one small JSON file, so that many processes can safely share
+    one cache.
+    """
+
+    def __init__(self, root: Path | str) -> None:
+        self.root = Path(root)
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f'{key[2:]}.json'
+
+    def get(self, key: str) -> list[TypeEdit] | None:
+        try:
+            data = json.loads(self._path(key).read_text())
+        except (OSError, ValueError):
+            return None
+        return [TypeEdit(**d) for d in data]
+
+    def put(self, key: str, edits: Sequence[TypeEdit]) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'w') as fp:
+            json.dump([e.asdict() for e in edits], fp)
+        os.replace(tmp, path)
@@ -0,0 +1,99 @@
+"""Make the parse and edit path safe to run on threads, which pays off on
+free-threaded Python builds, where threads need no pickling and run in parallel.
+"""
+
+from __future__ import annotations
+
+import functools
+import sys
+import threading
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, TypeVar, overload
+
+from typing_extensions import Self
+
+_T = TypeVar('_T')
+
+ENGINES = 'auto', 'process', 'thread'
+
+# A lock for each cached property that is being computed, by instance id and name.
+# They aren't kept on the instances, so pickling is unaffected.
+_LOCKS: dict[tuple[int, str], threading.Lock] = {}
+_LOCKS_LOCK = threading.Lock()
+
+_IMPORT_LOCK = threading.RLock()
+
+
+def is_free_threaded() -> bool:
+    """True if this Python is running without the GIL"""
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', None)
+    return is_gil_enabled is not None and not is_gil_enabled()
+
+
+def make_executor(jobs: int, engine: str = 'auto') -> Executor | None:
+    """An executor with `jobs` workers, or None to use asyncio's default threads.
+
+    'auto' means threads on a free-threaded build, and processes otherwise.
+    """
+    if jobs <= 1:
+        return None
+    if engine == 'thread' or (engine == 'auto' and is_free_threaded()):
+        return ThreadPoolExecutor(jobs, thread_name_prefix='fixo')
+    return ProcessPoolExecutor(jobs)
+
+
+class cached_property(functools.cached_property[_T]):
+    """Like `functools.cached_property`, except that a value is computed only once
+    even if several threads ask for it at the same time.
+
+    In Python 3.10 and 3.11, `functools.cached_property` has one lock for all the
+    instances of a class, and from 3.12 on, it has none.
+    """
+
+    @overload
+    def __get__(self, instance: None, owner: type[Any] | None = None) -> Self: ...
+
+    @overload
+    def __get__(self, instance: object, owner: type[Any] | None = None) -> _T: ...
+
+    def __get__(self, instance: object, owner: type[Any] | None = None) -> Any:
+        if instance is None:
+            return self
+        cache = instance.__dict__
+        name = self.attrname
+        assert name is not None
+        try:
+            return cache[name]
+        except KeyError:
+            pass
+
+        key = id(instance), name
+        with _LOCKS_LOCK:
+            lock = _LOCKS.setdefault(key, threading.Lock())
+        with lock:
+            try:
+                return cache[name]
+            except KeyError:
+                pass
+            try:
+                value = cache[name] = self.func(instance)
+            finally:
+                with _LOCKS_LOCK:
+                    _LOCKS.pop(key, None)
+            return value
+
+
+def import_cache(func: Callable[[str], _T]) -> Callable[[str], _T]:
+    """Like `functools.cache`, for importing, except that each address is imported
+    only once even if several threads ask for it at the same time
+    """
+    cached = functools.cache(func)
+
+    @functools.wraps(func)
+    def wrapper(address: str) -> _T:
+        # One lock for every import, as importing one address can import another
+        with _IMPORT_LOCK:
+            return cached(address)
+
+    return wrapper
@@ -0,0 +1,55 @@
+"""Merge the edits that several rules make to one file.
+
+Two edits collide if they annotate the same param (or return value) of the same
+function. Only one survives, chosen by rule priority, and it is dropped before any
+edit is applied or rendered.
+"""
+
+from __future__ import annotations
+
+import dataclasses as dc
+from collections.abc import Iterable, Sequence
+
+from .type_edit import TypeEdit
+
+
+@dc.dataclass(frozen=True)
+class Collision:
+    """Edits which gave different types to the same target"""
+
+    file: str
+    kept: TypeEdit
+    dropped: tuple[TypeEdit, ...]
+
+    def __str__(self) -> str:
+        k = self.kept
+        target = f'{k.function_name}({k.param})' if k.param else f'{k.function_name}()'
+        dropped = ', '.join(f'{e.type_name} ({e.rule})' for e in self.dropped)
+        return f'{self.file}: {target}: kept {k.type_name} ({k.rule}), not {dropped}'
+
+
+def merge(
+    file: str,
+    edits: Iterable[TypeEdit],
+    priority: Sequence[str] = (),
+) -> tuple[list[TypeEdit], list[Collision]]:
+    """Return one edit for each target in `edits`, and the collisions found.
+
+    Edits from rules earlier in `priority` win: rules missing from `priority` come
+    after all the rules in it. Among edits of equal priority, the first one wins.
+    Exact duplicates are dropped without being reported.
+    """
+    rank = {r: i for i, r in enumerate(priority)}
+    targets: dict[tuple[str, str], list[TypeEdit]] = {}
+    for e in edits:
+        targets.setdefault((e.function_name, e.param), []).append(e)
+
+    merged: list[TypeEdit] = []
+    collisions: list[Collision] = []
+    for same in targets.values():
+        kept, *rest = sorted(same, key=lambda e: rank.get(e.rule, len(rank)))
+        merged.append(kept)
+        if dropped := [e for e in rest if e.type_name != kept.type_name]:
+            collisions.append(Collision(file, kept, tuple(dropped)))
+
+    return merged, collisions
@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+import difflib
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from concurrent.futures import Executor
+from pathlib import Path
+
+from .blocks import split_lines
+from .blocks.python_file import PythonFile
+from .git_source import GitSource
+from .prefetch import map_files
+from .type_edit import TypeEdit, perform_type_edits
+
+
+def file_diff(file: str, edits: Sequence[TypeEdit], data: bytes | None = None) -> str:
+    """Render the edits to one file in memory, and return a unified diff"""
+    pf = PythonFile(path=Path(file), data=data)
+    after = split_lines(perform_type_edits(edits, pf))
+    lines = difflib.unified_diff(pf.lines, after, f'a/{file}', f'b/{file}')
+    return ''.join(lines)
+
+
+def diffs(
+    file_edits: Iterable[tuple[str, Sequence[TypeEdit]]],
+    executor: Executor | None = None,
+    source: GitSource | None = None,
+    missing: Callable[[str], None] | None = None,
+) -> Iterator[str]:
+    """Yield one diff per file, in the order of `file_edits`, computing them in
+    parallel if there is an executor. With a `source`, the files are read from its
+    revision rather than the working tree, as in `map_files`.
+    """
+    return map_files(file_diff, file_edits, executor, source, missing)
@@ -0,0 +1,102 @@
+"""Read source files as they were at some git revision, without a checkout.
+
+All blobs go through one long-lived `git cat-file --batch` process, requested in
+batches. Each batch reads a blob only once, by its SHA, which also makes a free
+content hash. Nothing is kept between batches, so memory stays bounded by the batch.
+"""
+
+from __future__ import annotations
+
+import dataclasses as dc
+import subprocess
+import threading
+from collections.abc import Iterable, Sequence
+from pathlib import Path
+from typing import IO
+
+# Why a file is skipped when it is not in the revision
+MISSING = 'Not in the git revision'
+
+
+@dc.dataclass(frozen=True)
+class Blob:
+    sha: str
+    data: bytes = dc.field(repr=False)
+
+
+class GitSource:
+    def __init__(self, revision: str, repo: Path | str = '.') -> None:
+        self.revision = revision
+        self.repo = Path(repo)
+        self._process: subprocess.Popen[bytes] | None = None
+
+    def verify(self) -> bool:
+        """Return True if the revision exists"""
+        cmd = 'git', 'rev-parse', '--verify', '--quiet', f'{self.revision}^{{commit}}'
+        return not subprocess.run(cmd, cwd=self.repo, capture_output=True).returncode
+
+    def close(self) -> None:
+        if (p := self._process) is not None:
+            assert p.stdin is not None
+            p.stdin.close()
+            p.wait()
+            self._process = None
+
+    def shas(self, files: Sequence[str]) -> dict[str, str]:
+        """Map each file which exists at the revision to its blob SHA"""
+        if not files:
+            return {}
+        cmd = 'git', 'ls-tree', '-r', '-z', self.revision, '--', *files
+        out = subprocess.run(cmd, cwd=self.repo, capture_output=True, check=True)
+        found: dict[Path, str] = {}
+        for entry in out.stdout.decode().split('\0'):
+            if entry:
+                info, _, path = entry.partition('\t')
+                _mode, kind, sha = info.split()
+                if kind == 'blob':
+                    found[(self.repo / path).resolve()] = sha
+
+        resolved = ((f, (self.repo / f).resolve()) for f in files)
+        return {f: found[r] for f, r in resolved if r in found}
+
+    def python_files(self, paths: Iterable[str]) -> list[str]:
+        """Like `python_files()`, but for the files in the revision"""
+        cmd = 'git', 'ls-tree', '-r', '-z', '--name-only', self.revision, '--', *paths
+        out = subprocess.run(cmd, cwd=self.repo, capture_output=True, check=True)
+        return sorted(f for f in out.stdout.decode().split('\0') if f.endswith('.py'))
+
+    def read(self, files: Sequence[str]) -> dict[str, Blob]:
+        """Read a batch of files, leaving out any that are not in the revision"""
+        shas = self.shas(files)
+        blobs = self._read_blobs(sorted(set(shas.values())))
+        return {f: blobs[s] for f, s in shas.items()}
+
+    def _read_blobs(self, shas: Sequence[str]) -> dict[str, Blob]:
+        if not shas:
+            return {}
+        if self._process is None:
+            cmd = 'git', 'cat-file', '--batch'
+            pipe = subprocess.PIPE
+            self._process = subprocess.Popen(
+                cmd, cwd=self.repo, stdin=pipe, stdout=pipe
+            )
+        p = self._process
+        assert p.stdin is not None and p.stdout is not None
+
+        # Write from another thread so a full stdout pipe cannot deadlock us
+        requests = b''.join(s.encode() + b'\n' for s in shas)
+        writer = threading.Thread(target=_write, args=(p.stdin, requests))
+        writer.start()
+        blobs: dict[str, Blob] = {}
+        for _ in shas:
+            sha, kind, size = p.stdout.readline().split()
+            data = p.stdout.read(int(size) + 1)[:-1]  # Each blob ends with \n
+            assert kind == b'blob', (sha, kind)
+            blobs[sha.decode()] = Blob(sha.decode(), data)
+        writer.join()
+        return blobs
+
+
+def _write(fp: IO[bytes], data: bytes) -> None:
+    fp.write(data)
+    fp.flush()
@@ -5,9 +5,10 @@ customized by the user with their own code.
 
 import dataclasses as dc
 import importlib
-from functools import cache
 from typing import Any, Generic, TypeVar, get_args
 
+from .concurrency import import_cache
+
 _T = TypeVar('_T')
 
 BASE_ADDRESS = 'fixo.rules'
@@ -27,7 +28,7 @@ class Importer(Generic[_T]):
         raise TypeError(f'Expected type {T} but at {address=}, got {data=}')
 
 
-@cache
+@import_cache
 def import_symbol(address: str) -> Any:
     """Import a specific symbol: if it start with a `.` make it relative to fixo.rules"""
 
@@ -41,7 +42,7 @@ def import_symbol(address: str) -> Any:
     return getattr(importlib.import_module(module), name)
 
 
-@cache
+@import_cache
 def import_dict(address: str) -> dict[str, Any]:
     """Import a symbol and try to make it a dict."""
     x = import_symbol(address)
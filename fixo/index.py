@@ -0,0 +1,231 @@
+"""A persistent SQLite index of the functions and classes in a tree and their
+signatures, so rules can be written and tried out without a type checker.
+
+Updating the index only parses the files whose contents changed since the last
+update. Queries select from the `symbols` view, which has one row for the return
+type and each parameter of each function: the return type has an empty `param`.
+"""
+
+from __future__ import annotations
+
+import dataclasses as dc
+import hashlib
+import itertools
+import re
+import sqlite3
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from .blocks.python_file import PythonFile
+from .message import Category, LineCharacter, Message
+from .prefetch import read_ahead
+
+if TYPE_CHECKING:
+    from .pipeline import FileEdits
+    from .public import PublicApi
+    from .rule import Rule
+
+# The columns of the `symbols` view, which can appear in a `where` clause
+COLUMNS = (
+    'file',
+    'function',
+    'method',
+    'decorators',
+    'param',
+    'annotated',
+    'line',
+    'col',
+    'end_col',
+    'fingerprint',
+)
+
+_CREATE = """
+CREATE TABLE IF NOT EXISTS files (
+    file TEXT PRIMARY KEY,
+    hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS blocks (
+    id INTEGER PRIMARY KEY,
+    file TEXT NOT NULL REFERENCES files (file) ON DELETE CASCADE,
+    function TEXT NOT NULL,
+    class INTEGER NOT NULL,
+    method INTEGER NOT NULL,
+    decorators TEXT NOT NULL,
+    fingerprint TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS params (
+    id INTEGER PRIMARY KEY,
+    block INTEGER NOT NULL REFERENCES blocks (id) ON DELETE CASCADE,
+    param TEXT NOT NULL,
+    annotated INTEGER NOT NULL,
+    line INTEGER NOT NULL,
+    col INTEGER NOT NULL,
+    end_col INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS blocks_file ON blocks (file);
+CREATE INDEX IF NOT EXISTS params_block ON params (block);
+CREATE INDEX IF NOT EXISTS params_param ON params (param);
+CREATE VIEW IF NOT EXISTS symbols AS
+    SELECT b.file, b.function, b.method, b.decorators, p.param, p.annotated, p.line,
+        p.col, p.end_col, b.fingerprint, p.block, p.id
+    FROM params p JOIN blocks b ON p.block = b.id;
+"""
+
+
+@dc.dataclass
+class Update:
+    """What one update of the index did"""
+
+    indexed: int = 0
+    unchanged: int = 0
+    removed: int = 0
+
+    # Files which could not be read or parsed, with the reason
+    errors: dict[str, str] = dc.field(default_factory=dict)
+
+    def __str__(self) -> str:
+        s = f'{self.indexed} files indexed, {self.unchanged} unchanged'
+        s += f', {self.removed} removed' if self.removed else ''
+        return s + (f', {len(self.errors)} failed' if self.errors else '')
+
+
+class SymbolIndex:
+    def __init__(self, path: Path | str) -> None:
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA foreign_keys = ON')
+        self.db.create_function('regexp', 2, _regexp, deterministic=True)
+        self.db.executescript(_CREATE)
+
+    def close(self) -> None:
+        self.db.close()
+
+    def update(self, files: Iterable[Path]) -> Update:
+        """Index each file whose contents changed, and forget indexed files that no
+        longer exist
+        """
+        u = Update()
+        hashes = dict(self.db.execute('SELECT file, hash FROM files'))
+        with self.db:
+            for path, data in read_ahead(files, lambda p: p):
+                file = str(path)
+                if data is None:
+                    self._forget(file)
+                    u.errors[file] = 'Cannot read file'
+                    continue
+                digest = hashlib.sha256(data).hexdigest()
+                if hashes.pop(file, None) == digest:
+                    u.unchanged += 1
+                    continue
+                try:
+                    blocks = list(_blocks(PythonFile(path=path, data=data)))
+                except Exception as e:
+                    self._forget(file)
+                    u.errors[file] = ' '.join(str(a) for a in e.args)
+                    continue
+                self._add(file, digest, blocks)
+                u.indexed += 1
+
+            gone = [(f,) for f in hashes if not Path(f).exists()]
+            self.db.executemany('DELETE FROM files WHERE file = ?', gone)
+            u.removed = len(gone)
+        return u
+
+    def select(self, where: str = '') -> Iterator[dict[str, Any]]:
+        """Select symbols: `where` is an SQL condition like
+        "param REGEXP 'is_' AND NOT annotated"
+        """
+        names = ', '.join(COLUMNS)
+        sql = f'SELECT {names} FROM symbols{_where(where)} ORDER BY file, block, id'
+        for row in self.db.execute(sql):
+            yield dict(zip(COLUMNS, row))
+
+    def messages(self, where: str = '') -> Iterator[Message]:
+        """The same messages that scanning the files with `-t direct` would give,
+        for each missing annotation
+        """
+        where = f'NOT annotated AND ({where})' if where else 'NOT annotated'
+        for r in self.select(where):
+            yield Message(
+                name=r['function'],
+                file=r['file'],
+                severity='',
+                message=r['param'],
+                start=LineCharacter(r['line'], r['col']),
+                end=LineCharacter(r['line'], r['end_col']),
+                category=Category.method if r['method'] else Category.function,
+            )
+
+    def edits(
+        self, rules: dict[str, Rule], where: str = '', public: PublicApi | None = None
+    ) -> FileEdits:
+        """Evaluate rules written for `-t direct` against the index, without reading
+        any files unless a rule needs to. With `public`, only for the public API.
+        """
+        sql = 'SELECT file, function, fingerprint FROM blocks'
+        fingerprints = {(f, name): fp for f, name, fp in self.db.execute(sql)}
+        result: FileEdits = {}
+        messages: Iterable[Message] = self.messages(where)
+        if public is not None:
+            messages = filter(public.accept, messages)
+        by_file = itertools.groupby(messages, lambda m: m.file)
+        for file, group in by_file:
+            messages = list(group)
+            # Nothing is read unless a rule looks at the file
+            pf = PythonFile(path=Path(file))
+            for name, rule in rules.items():
+                for e in rule.file_edits(pf, messages):
+                    fp = fingerprints.get((file, e.function_name), '')
+                    e = dc.replace(e, rule=name, fingerprint=fp)
+                    result.setdefault(file, []).append(e)
+        return result
+
+    def _forget(self, file: str) -> None:
+        """Delete a file and, by cascading, all of its symbols"""
+        self.db.execute('DELETE FROM files WHERE file = ?', (file,))
+
+    def _add(self, file: str, digest: str, blocks: list[_Block]) -> None:
+        self._forget(file)
+        self.db.execute('INSERT INTO files VALUES (?, ?)', (file, digest))
+        for b in blocks:
+            sql = """INSERT INTO blocks (file, function, class, method, decorators,
+                fingerprint) VALUES (?, ?, ?, ?, ?, ?)"""
+            block = self.db.execute(sql, (file, *b.row)).lastrowid
+            sql = """INSERT INTO params (block, param, annotated, line, col, end_col)
+                VALUES (?, ?, ?, ?, ?, ?)"""
+            self.db.executemany(sql, ((block, *p) for p in b.params))
+
+
+@dc.dataclass
+class _Block:
+    # The row for the `blocks` table, without the file
+    row: tuple[Any, ...]
+
+    # The rows for the `params` table, without the block
+    params: list[tuple[Any, ...]]
+
+
+def _blocks(pf: PythonFile) -> Iterator[_Block]:
+    def param(index: int, name: str, annotated: bool) -> tuple[Any, ...]:
+        (line, col), (_, end_col) = pf.tokens[index].start, pf.tokens[index].end
+        return name, annotated, line, col, end_col
+
+    for b in pf.blocks:
+        decorators = ' '.join(b.decorators)
+        row = b.full_name, b.is_class, b.is_method, decorators, b.fingerprint
+        params, returns = b.signature
+        if b.is_class:
+            yield _Block(row, [])
+        else:
+            # As in `-t direct`, a return type is placed at the function's name
+            rows = [param(b.begin + 1, '', returns)]
+            rows.extend(param(p.index, p.name, p.annotated) for p in params)
+            yield _Block(row, rows)
+
+
+def _regexp(pattern: str, s: str | None) -> bool:
+    return s is not None and re.match(pattern, s) is not None
+
+
+def _where(where: str) -> str:
+    return f' WHERE {where}' if where else ''
@@ -0,0 +1,70 @@
+"""A checkpoint journal, so that a long find or edit run can be resumed.
+
+The journal is a file of JSON lines, one for each piece of work finished, written
+and flushed as soon as that work is done, so it survives crashes and Ctrl-C.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Any
+
+from .type_edit import TypeEdit
+
+
+def file_hash(path: str | Path, data: bytes | None = None) -> str:
+    """Hash a file's contents, which are read unless they are passed in `data`"""
+    return hashlib.sha256(Path(path).read_bytes() if data is None else data).hexdigest()
+
+
+class Journal:
+    def __init__(self, path: Path, resume: bool = False) -> None:
+        # Finished work, by key
+        self.done: dict[str, list[TypeEdit]] = {}
+
+        # The hash of each file when fixo last wrote it
+        self.hashes: dict[str, str] = {}
+
+        if resume and path.exists():
+            for line in path.read_text().splitlines():
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # The last line of a run that crashed while writing
+                self._add(entry)
+        self._fp = path.open('a' if resume else 'w')
+
+    def close(self) -> None:
+        self._fp.close()
+
+    @staticmethod
+    def key(file: str, work: Sequence[Any]) -> str:
+        """A key for one piece of work on one file: `work` is the list of messages or
+        edits that were being processed.
+        """
+        digest = hashlib.blake2b(repr(work).encode(), digest_size=16).hexdigest()
+        return f'{file}:{digest}'
+
+    def record(
+        self, key: str, file: str, edits: Sequence[TypeEdit], written: bool = False
+    ) -> None:
+        entry: dict[str, Any] = {'key': key, 'file': file}
+        entry['edits'] = [e.asdict() for e in edits]
+        if written:
+            entry['hash'] = file_hash(file)
+        self._add(entry)
+        self._fp.write(json.dumps(entry) + '\n')
+        self._fp.flush()
+
+    def verify(self, file: str) -> bool:
+        """Return False if fixo wrote this file, and it has changed since"""
+        h = self.hashes.get(file)
+        return h is None or (Path(file).exists() and h == file_hash(file))
+
+    def _add(self, entry: dict[str, Any]) -> None:
+        self.done[entry['key']] = [TypeEdit(**e) for e in entry['edits']]
+        if h := entry.get('hash'):
+            self.hashes[entry['file']] = h
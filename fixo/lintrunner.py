@@ -0,0 +1,63 @@
+"""Run fixo as a lintrunner linter, on the files lintrunner passes in.
+
+Something like this in `.lintrunner.toml`:
+
+    [[linter]]
+    code = 'FIXO'
+    include_patterns = ['**/*.py']
+    command = ['python', '-m', 'fixo', '--lintrunner', '-t', 'direct',
+               '--cache', '.fixo_cache', '@{{PATHSFILE}}']
+
+All the edits to a file become one lint message, whose replacement is the whole file
+with every edit performed: lintrunner applies a message by replacing the whole file,
+so several messages for one file would conflict.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import Any
+
+from .blocks.python_file import PythonFile
+from .git_source import GitSource
+from .prefetch import map_files
+from .type_edit import TypeEdit, perform_type_edits
+
+CODE = 'FIXO'
+
+
+def lint_message(
+    file: str, edits: Sequence[TypeEdit], data: bytes | None = None
+) -> dict[str, Any]:
+    pf = PythonFile(path=Path(file), data=data)
+
+    def describe(e: TypeEdit) -> str:
+        target = f'parameter `{e.param}`' if e.param else 'the return value'
+        return f'Add type `{e.type_name}` to {target} of `{e.function_name}`'
+
+    return {
+        'path': file,
+        'line': min(e.block(pf).start_line for e in edits),
+        'char': None,
+        'code': CODE,
+        'severity': 'advice',
+        'name': ', '.join(sorted({e.rule or 'edit' for e in edits})),
+        'original': pf.contents,
+        'replacement': perform_type_edits(edits, pf),
+        'description': '\n'.join(describe(e) for e in edits),
+    }
+
+
+def lint(
+    file_edits: Iterable[tuple[str, Sequence[TypeEdit]]],
+    executor: Executor | None = None,
+    source: GitSource | None = None,
+    missing: Callable[[str], None] | None = None,
+) -> Iterator[dict[str, Any]]:
+    """Yield a lint message for each file, in order, computing them in parallel if
+    there is an executor. With a `source`, the files are read from its revision
+    rather than the working tree, as in `map_files`.
+    """
+    return map_files(lint_message, file_edits, executor, source, missing)
@@ -0,0 +1,84 @@
+"""Keep the memory used by a find run under a budget.
+
+Files are processed in batches: after each batch, its edits are flushed and its
+files and messages are released, and the next batch is made smaller if the process
+is over its budget, or larger if it is well under it.
+
+Only this process is measured, not the worker processes of `--jobs`.
+"""
+
+from __future__ import annotations
+
+import dataclasses as dc
+import gc
+import os
+import re
+import sys
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # type: ignore[assignment]
+
+_SIZE_RE = re.compile(r'(\d+(?:\.\d+)?)\s*([kmgt]?)i?b?', re.IGNORECASE)
+_UNITS = {'': 1, 'k': 2**10, 'm': 2**20, 'g': 2**30, 't': 2**40}
+
+
+def parse_size(s: str) -> int:
+    """Parse a size in bytes like '8G', '512MiB' or '1000000'"""
+    if not (m := _SIZE_RE.fullmatch(s.strip())):
+        raise ValueError(f'Cannot understand size {s!r}')
+    number, unit = m.groups()
+    return int(float(number) * _UNITS[unit.lower()])
+
+
+def resident() -> int:
+    """The resident set size of this process in bytes, now if possible"""
+    try:
+        with open('/proc/self/statm') as fp:
+            return int(fp.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return peak()
+
+
+def peak() -> int:
+    """The largest resident set size of this process so far, in bytes"""
+    if resource is None:
+        return 0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def mib(size: int) -> str:
+    return f'{size / 2**20:.0f}MiB'
+
+
+@dc.dataclass
+class MemoryBudget:
+    # The most memory this process should use, in bytes
+    limit: int
+
+    # How many files to process in the next batch
+    batch: int = 64
+
+    max_batch: int = 4096
+
+    # The most memory that was seen in use after a batch
+    high_water: int = 0
+
+    def update(self) -> None:
+        """Called after each batch, once its memory is released"""
+        rss = resident()
+        self.high_water = max(self.high_water, rss)
+        if rss > self.limit:
+            gc.collect()
+            self.batch = max(1, self.batch // 2)
+        elif rss < self.limit // 2:
+            self.batch = min(self.max_batch, self.batch * 2)
+
+    def __str__(self) -> str:
+        high_water = max(self.high_water, peak())
+        return (
+            f'high-water mark {mib(high_water)} of a budget of {mib(self.limit)}, '
+            f'last batch {self.batch} files'
+        )
@@ -1,10 +1,14 @@
 import dataclasses as dc
+from collections.abc import Iterable, Iterator
 from enum import Enum
-from functools import cached_property
+from typing import Any
+
+from .concurrency import cached_property
 
 
 class Category(str, Enum):
     function = 'function'
+    method = 'method'
     param = 'param'
 
 
@@ -29,3 +33,33 @@ class Message:
     @cached_property
     def base_name(self) -> str:
         return self.name.rpartition('.')[2]
+
+    @property
+    def key(self) -> tuple[Any, ...]:
+        """Messages with the same key are about the same thing. The parameter, if
+        any, is in the message text.
+        """
+        s, e = self.start, self.end
+        return self.file, s.line, s.character, e.line, e.character, self.message
+
+
+@dc.dataclass
+class Dedupe:
+    """Drop each message with the same key as an earlier one.
+
+    pyright --verifytypes reports a function once for each name it is exported
+    under, with the same file, range and message text each time.
+    """
+
+    seen: set[tuple[Any, ...]] = dc.field(default_factory=set)
+
+    # How many messages were dropped
+    removed: int = 0
+
+    def __call__(self, messages: Iterable[Message]) -> Iterator[Message]:
+        for m in messages:
+            if (key := m.key) in self.seen:
+                self.removed += 1
+            else:
+                self.seen.add(key)
+                yield m
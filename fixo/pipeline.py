@@ -0,0 +1,475 @@
+"""An asyncio pipeline that overlaps running the type checker with parsing its
+output, and generating the edits for each file with writing the others.
+
+The stages are connected by bounded queues, so a slow stage applies backpressure to
+the stages before it instead of letting their results pile up in memory.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import dataclasses as dc
+import itertools
+import sys
+import uuid
+from collections.abc import Callable, Collection, Iterable, Iterator, Sequence
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import Any, Protocol, runtime_checkable
+
+from .blocks.python_file import PythonFile
+from .cache import RuleCache, digest
+from .concurrency import cached_property
+from .conflicts import Collision, merge
+from .git_source import MISSING, Blob, GitSource
+from .journal import Journal, file_hash
+from .memory import MemoryBudget
+from .message import Dedupe, Message
+from .prefilter import Prefilter
+from .progress import Progress
+from .public import PublicApi
+from .rule import Rule
+from .type_edit import TypeEdit, perform_type_edits
+from .verify import Checked, report, verify, write_temp
+
+CHANGED = 'Changed since it was edited: not resuming'
+REPORTED_AGAIN = 'Reported again after other files: not editing'
+
+FileEdits = dict[str, list[TypeEdit]]
+FileItem = tuple[str, list[TypeEdit]]
+
+
+@runtime_checkable
+class ParseLines(Protocol):
+    """Parse messages out of the type checker's output, one line at a time"""
+
+    def __call__(self, lines: Iterable[str]) -> Iterator[Message]: ...
+
+
+@dc.dataclass
+class FileResult:
+    edits: list[TypeEdit]
+    collisions: list[Collision] = dc.field(default_factory=list)
+
+    # If requested, a temporary file beside the file, holding its verified new
+    # contents with all the edits performed
+    temp: str = ''
+
+    # True if the prefilter dropped this file without parsing it
+    pruned: bool = False
+
+
+@runtime_checkable
+class ScanFile(Protocol):
+    """Find messages by reading a Python file directly, without a type checker"""
+
+    def __call__(self, pf: PythonFile) -> Iterator[Message]: ...
+
+
+@dc.dataclass
+class FileEditor:
+    """Generates the edits for one file at a time: it gets pickled to run in other
+    processes, so it only holds what every file needs, and only its config is sent.
+    """
+
+    rules: dict[str, Rule]
+
+    # If True, also render the new contents of the file
+    render: bool = False
+
+    # Rule names, highest priority first, to resolve colliding edits
+    priority: Sequence[str] = ()
+
+    # If set, messages are also found by scanning each file
+    scan: ScanFile | None = None
+
+    # If set, files and messages which cannot match are dropped before parsing
+    prefilter: Prefilter | None = None
+
+    # If set, reuse the edits from earlier runs of unchanged rules on unchanged files
+    cache: RuleCache | None = None
+
+    # If set, only edit the public API: other files and messages are dropped
+    public: PublicApi | None = None
+
+    # Names this editor in worker processes, which each build their own copy once
+    key: str = dc.field(default_factory=lambda: uuid.uuid4().hex)
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        """Pickle only the config, not what the editor has cached: a worker process
+        builds the editor the first time it is sent a file, and keeps it
+        """
+        root = self.cache.root if self.cache else None
+        config = self.rules, self.render, self.priority, self.scan, self.prefilter
+        return _worker_editor, (self.key, config, root, self.public is not None)
+
+    def __call__(
+        self, file: str, messages: Sequence[Message], blob: Blob | None = None
+    ) -> FileResult:
+        """Run every rule over the messages for one file, sharing one PythonFile.
+
+        If there is a `blob`, it holds the file's contents, otherwise the file is
+        read from disk. Colliding edits are merged before anything is rendered.
+        """
+        data = blob.data if blob else None
+        if (pre := self.prefilter) is not None:
+            # Read once, for both the prefilter and the PythonFile
+            if data is None:
+                data = Path(file).read_bytes()
+            if not pre.accept_file(data):
+                return FileResult([], pruned=True)
+            messages = [m for m in messages if pre.accept_message(m)]
+        if (public := self.public) is not None:
+            if not public.may_be_public(file):
+                return FileResult([])
+            messages = [m for m in messages if public.accept(m)]
+
+        # Nothing is parsed, or read if it was not above, until a rule misses the cache
+        pf = PythonFile(path=Path(file), data=data)
+        try:
+            file_key = ''
+            if self.cache is not None:
+                file_key = digest(blob.sha if blob else file_hash(file, data), messages)
+
+            # Scanned messages only depend on the file contents, which are in `file_key`
+            all_messages = None if self.scan else messages
+
+            edits: list[TypeEdit] = []
+            for name, rule in self.rules.items():
+                if self.cache is not None:
+                    key = digest(rule.fingerprint, file_key)
+                    if (hit := self.cache.get(key)) is not None:
+                        edits.extend(hit)
+                        continue
+
+                if all_messages is None:
+                    assert self.scan is not None
+                    all_messages = [*messages, *self.scan(pf)]
+                new = [
+                    dc.replace(e, rule=name).with_fingerprint(pf)
+                    for e in rule.file_edits(pf, all_messages)
+                ]
+                if self.cache is not None:
+                    self.cache.put(key, new)
+                edits.extend(new)
+
+            if public is not None and self.scan is not None:
+                # Scanned messages are filtered here, after the cache, which then does
+                # not depend on the `__all__` of other files
+                edits = [e for e in edits if public.is_public(file, e.function_name)]
+
+            r = FileResult(*merge(file, edits, self.priority or list(self.rules)))
+            if self.render and r.edits:
+                contents = perform_type_edits(r.edits, pf)
+                verify(pf, contents)
+                r.temp = write_temp(file, contents.encode(pf.encoding))
+        finally:
+            # Release the file before it is written
+            pf.close()
+        return r
+
+
+# The editor that this worker process was last sent, by key
+_WORKER_EDITORS: dict[str, FileEditor] = {}
+
+
+def _worker_editor(
+    key: str, config: tuple[Any, ...], cache: Path | None, public: bool
+) -> FileEditor:
+    if (editor := _WORKER_EDITORS.get(key)) is None:
+        # An editor from an earlier pipeline is not used again
+        _WORKER_EDITORS.clear()
+        editor = _WORKER_EDITORS[key] = FileEditor(
+            *config,
+            cache=RuleCache(cache) if cache else None,
+            public=PublicApi() if public else None,
+            key=key,
+        )
+    return editor
+
+
+@dc.dataclass
+class Pipeline:
+    rules: dict[str, Rule]
+    parse_lines: ParseLines
+
+    # Where edits are generated: None means asyncio's default thread pool
+    executor: Executor | None = None
+
+    # If True, write each file as soon as its edits are generated
+    write: bool = False
+
+    # How many files may be in flight in the edit stage at once
+    workers: int = 4
+
+    # How many groups of messages may be waiting between the parse and edit stages
+    queue_size: int = 64
+
+    # Rule names, highest priority first, to resolve colliding edits
+    priority: Sequence[str] = ()
+
+    # If set, messages are also found by scanning each file in the edit stage
+    scan: ScanFile | None = None
+
+    prefilter: Prefilter | None = None
+
+    cache: RuleCache | None = None
+
+    public: PublicApi | None = None
+
+    # If set, read files from this git revision instead of the working tree
+    source: GitSource | None = None
+
+    # If set, skip work that was finished in an earlier run, and record new work
+    journal: Journal | None = None
+
+    # If set, files are processed in batches sized to keep memory under a budget
+    budget: MemoryBudget | None = None
+
+    # If set, the edits for each batch are passed to this as soon as the batch is
+    # finished, instead of being kept and returned
+    flush: Callable[[FileEdits], None] | None = None
+
+    # If set, counts each file, message and edit as it is done
+    progress: Progress | None = None
+
+    verbose: bool = False
+
+    # If set, the checker reports all of a file's messages together, so each file
+    # is edited as soon as the output moves on, while the checker is still running
+    grouped: bool = False
+
+    # Every collision found, filled in by `run()`
+    collisions: list[Collision] = dc.field(default_factory=list)
+
+    # The number of files dropped by the prefilter, filled in by `run()`
+    pruned: int = 0
+
+    # Drops duplicate messages, and counts them, in `run()`
+    dedupe: Dedupe = dc.field(default_factory=Dedupe)
+
+    def run(
+        self, lines: Iterable[str], only: Collection[str] | None = None
+    ) -> FileEdits:
+        """Find edits from the lines of a type checker's output, only for the files
+        in `only` if it is set
+        """
+
+        def groups() -> Iterator[tuple[str, list[Message]]]:
+            # Messages from an earlier run were about the files before they were
+            # edited, so they are not duplicates
+            self.dedupe.seen.clear()
+            messages = (
+                m
+                for m in self.dedupe(self.parse_lines(lines))
+                if only is None or m.file in only
+            )
+            if self.grouped:
+                yield from self._grouped(messages)
+                return
+
+            # Checkers can report a file again after other files, and every edit to
+            # a file must be found from the same contents, so a file's messages are
+            # only complete at the end of the output
+            file_messages: dict[str, list[Message]] = {}
+            for m in messages:
+                file_messages.setdefault(m.file, []).append(m)
+            for file in list(file_messages):
+                # Hand each group over, so it is released once its file is edited
+                yield file, file_messages.pop(file)
+
+        return asyncio.run(self._run(groups()))
+
+    def _grouped(
+        self, messages: Iterable[Message]
+    ) -> Iterator[tuple[str, list[Message]]]:
+        """Yield each file's messages as soon as the output moves on to another file"""
+        done: set[str] = set()
+        for file, group in itertools.groupby(messages, lambda m: m.file):
+            if file in done:
+                # Its edits were already found, from all of its messages
+                self._error(file, ValueError(REPORTED_AGAIN))
+                continue
+            done.add(file)
+            yield file, list(group)
+
+    def run_files(self, files: Iterable[str]) -> FileEdits:
+        """Find edits by scanning files, with no type checker output"""
+        # Each file must be in only one group, or with --max-memory, its edits
+        # could be flushed in two batches
+        return asyncio.run(self._run((f, []) for f in dict.fromkeys(files)))
+
+    async def _run(self, groups: Iterable[tuple[str, list[Message]]]) -> FileEdits:
+        """Find the edits for each group, which must name each file only once: a
+        file's edits are only merged, and written, once
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue[tuple[str, list[Message], Blob | None] | None]
+        queue = asyncio.Queue(self.queue_size)
+        result: FileEdits = {}
+        editor = self.editor
+
+        # The files rendered so far, each with its journal key and edits: they are
+        # only written once every file in the batch is checked
+        checked: list[tuple[Checked, str, list[TypeEdit]]] = []
+
+        def put(item: tuple[str, list[Message], Blob | None] | None) -> None:
+            # Blocks the parsing thread while the queue is full
+            asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+        def parse() -> None:
+            try:
+                if self.source is None and self.budget is None:
+                    for file, messages in groups:
+                        put((file, messages, None))
+                        del messages  # Release them while parsing the next file
+                    return
+
+                it = iter(groups)
+                while batch := list(itertools.islice(it, self._batch_size)):
+                    blobs = (
+                        self.source.read([f for f, _ in batch]) if self.source else {}
+                    )
+                    for file, messages in batch:
+                        if self.source is None:
+                            put((file, messages, None))
+                        elif blob := blobs.get(file):
+                            put((file, messages, blob))
+                        else:
+                            self._error(file, FileNotFoundError(MISSING))
+                        del messages
+                    del batch, blobs  # Release them before waiting
+
+                    if self.budget is not None:
+                        asyncio.run_coroutine_threadsafe(end_batch(), loop).result()
+            finally:
+                for _ in range(self.workers):
+                    put(None)
+
+        async def end_batch() -> None:
+            nonlocal result
+            await queue.join()
+            await asyncio.to_thread(self._write, checked)
+            if self.flush is not None and result:
+                batch, result = result, {}
+                self.flush(dict(sorted(batch.items())))
+            assert self.budget is not None
+            self.budget.update()
+
+        async def edit() -> None:
+            while (item := await queue.get()) is not None:
+                edits = 0
+                try:
+                    edits = await edit_file(*item)
+                finally:
+                    queue.task_done()
+                    if self.progress is not None:
+                        self.progress.advance(messages=len(item[1]), edits=edits)
+                    del item  # Release the messages while waiting for the next file
+
+        async def edit_file(
+            file: str, messages: list[Message], blob: Blob | None
+        ) -> int:
+            """Find the edits for one file, and return how many there were"""
+            key = self.journal.key(file, messages) if self.journal else ''
+            if self.journal is not None:
+                if (done := self.journal.done.get(key)) is not None:
+                    if not self.journal.verify(file):
+                        self._error(file, ValueError(CHANGED))
+                        return 0
+                    if done:
+                        result[file] = done
+                    return len(done)
+
+            try:
+                r = await loop.run_in_executor(
+                    self.executor, editor, file, messages, blob
+                )
+            except Exception as e:
+                if not self.write:
+                    self._error(file, e)
+                    return 0
+                # Reported with the other failures, before anything is written
+                checked.append((Checked.failure(file, e), key, []))
+                return 0
+
+            if r.temp:
+                checked.append((Checked(file, r.temp), key, r.edits))
+            elif self.journal is not None:
+                self.journal.record(key, file, r.edits, False)
+
+            self.pruned += r.pruned
+            for c in r.collisions:
+                self._print('COLLISION:', c)
+            self.collisions.extend(r.collisions)
+            if r.edits:
+                result[file] = r.edits
+            return len(r.edits)
+
+        try:
+            await asyncio.gather(
+                asyncio.to_thread(parse), *(edit() for _ in range(self.workers))
+            )
+            await asyncio.to_thread(self._write, checked)
+        finally:
+            # Remove the temporary files that were not moved into place
+            for c, _, _ in checked:
+                c.discard()
+        result = dict(sorted(result.items()))
+        if self.flush is None:
+            return result
+        if result:
+            self.flush(result)
+        return {}
+
+    def _write(self, checked: list[tuple[Checked, str, list[TypeEdit]]]) -> None:
+        """Report the files that failed, as `fixo edits.json` does, then move the
+        others into place, and empty `checked`
+        """
+        report([c for c, _, _ in checked], self._print, self.verbose)
+        try:
+            for c, key, edits in checked:
+                if c.error:
+                    continue
+                try:
+                    c.replace()
+                except Exception as e:
+                    self._error(c.file, e)
+                    continue
+                if self.journal is not None:
+                    self.journal.record(key, c.file, edits, True)
+                self._print(f'{c.file}: {len(edits)}')
+        finally:
+            for c, _, _ in checked:
+                c.discard()
+            checked.clear()
+
+    @cached_property
+    def editor(self) -> FileEditor:
+        """One editor for every run, so worker processes keep their caches"""
+        return FileEditor(
+            self.rules,
+            self.write,
+            self.priority,
+            self.scan,
+            self.prefilter,
+            self.cache,
+            self.public,
+        )
+
+    @property
+    def _batch_size(self) -> int:
+        return self.budget.batch if self.budget else self.queue_size
+
+    def _print(self, *args: object) -> None:
+        if self.progress is not None:
+            self.progress.print(*args)
+        else:
+            print(*args, file=sys.stderr)
+
+    def _error(self, file: str, e: Exception) -> None:
+        self._print(f'ERROR: {file}:', *e.args)
+        if self.verbose:
+            import traceback
+
+            traceback.print_exception(e)
@@ -0,0 +1,103 @@
+"""Read files on a thread pool ahead of the loops that parse and edit them, so that
+slow or cold file systems don't leave the CPU waiting on each file in turn.
+"""
+
+from __future__ import annotations
+
+import itertools
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, TypeVar
+
+from .git_source import MISSING
+
+if TYPE_CHECKING:
+    from .git_source import GitSource
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+# How many files may be read but not yet used
+AHEAD = 16
+
+# How many files may be being read at once
+THREADS = 4
+
+# How many files to read and process at a time, when they are not read ahead
+BATCH = 256
+
+
+def read_ahead(
+    items: Iterable[T],
+    file: Callable[[T], str | Path],
+    ahead: int = AHEAD,
+    threads: int = THREADS,
+) -> Iterator[tuple[T, bytes | None]]:
+    """Yield each item with the contents of its file, read up to `ahead` items early.
+
+    If a file can't be read, its contents are None, so the caller reads it itself
+    and the error turns up where it always did.
+    """
+    it = iter(items)
+    pending: deque[tuple[T, Future[bytes | None]]] = deque()
+    pool = ThreadPoolExecutor(threads, thread_name_prefix='fixo-read')
+
+    def submit(n: int) -> None:
+        for item in itertools.islice(it, n):
+            pending.append((item, pool.submit(_read, file(item))))
+
+    try:
+        submit(ahead)
+        while pending:
+            item, future = pending.popleft()
+            submit(1)
+            yield item, future.result()
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def _read(file: str | Path) -> bytes | None:
+    try:
+        return Path(file).read_bytes()
+    except OSError:
+        return None
+
+
+def map_files(
+    func: Callable[[str, T, bytes | None], R],
+    items: Iterable[tuple[str, T]],
+    executor: Executor | None = None,
+    source: GitSource | None = None,
+    missing: Callable[[str], None] | None = None,
+) -> Iterator[R]:
+    """Yield `func(file, x, data)` for each `(file, x)` in `items`, in order, where
+    `data` is the file's contents, or None if `func` should read it itself.
+
+    With a `source`, the files are read from its revision rather than the working
+    tree. A file that is not in the revision is passed to `missing` and skipped, or
+    raises FileNotFoundError if there is no `missing`. With an executor, `func` runs
+    on it, in parallel.
+    """
+    if executor is None and source is None:
+        for (file, x), data in read_ahead(items, lambda item: item[0]):
+            yield func(file, x, data)
+        return
+
+    it = iter(items)
+    while chunk := list(itertools.islice(it, BATCH)):
+        blobs = source.read([f for f, _ in chunk]) if source else {}
+        if source is not None:
+            # Never fall back to the working tree, which would mix in other changes
+            for file in (f for f, _ in chunk if f not in blobs):
+                if missing is None:
+                    raise FileNotFoundError(f'{file}: {MISSING}')
+                missing(file)
+            chunk = [c for c in chunk if c[0] in blobs]
+        files, xs = [f for f, _ in chunk], [x for _, x in chunk]
+        data = [b.data if (b := blobs.get(f)) else None for f in files]
+        if executor is None:
+            yield from map(func, files, xs, data)
+        else:
+            yield from executor.map(func, files, xs, data, chunksize=16)
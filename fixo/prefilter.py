@@ -0,0 +1,53 @@
+"""A cheap filter which rejects files and messages that no rule could match,
+by searching their raw text for any rule's `name_match`.
+"""
+
+from __future__ import annotations
+
+import dataclasses as dc
+import re
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+from .message import Message
+from .rule import Rule
+
+# Patterns with anchors other than the implicit one at the start cannot be found
+# by searching raw text, so they disable the filter
+_ANCHORS = re.compile(r'(?<!\\)[$^]|\\[AZ]')
+
+
+@dc.dataclass(frozen=True)
+class Prefilter:
+    text: re.Pattern[str]
+    raw: re.Pattern[bytes]
+
+    @staticmethod
+    def create(rules: Iterable[Rule]) -> Prefilter | None:
+        """Return a Prefilter for these rules, or None if nothing can be filtered"""
+        matches = [r.name_match for r in rules]
+        if not matches or not all(matches) or any(map(_ANCHORS.search, matches)):
+            return None
+        pattern = r'\b(?:' + '|'.join(f'(?:{m})' for m in matches) + ')'
+        return Prefilter(re.compile(pattern), re.compile(pattern.encode()))
+
+    def accept_file(self, file: str | Path | bytes) -> bool:
+        """Search a file, or its raw contents if `file` is bytes"""
+        data = file if isinstance(file, bytes) else Path(file).read_bytes()
+        return self.raw.search(data) is not None
+
+    def accept_message(self, m: Message) -> bool:
+        return self.text.search(m.name) is not None or (
+            self.text.search(m.message) is not None
+        )
+
+    def files(self, files: Iterable[Path], pruned: list[Path]) -> Iterator[Path]:
+        """Yield the files which might match, and append the rest to `pruned`.
+
+        Anything which is not a file, like a module name, is passed through.
+        """
+        for f in files:
+            if not f.is_file() or self.accept_file(f):
+                yield f
+            else:
+                pruned.append(f)
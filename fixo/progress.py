@@ -0,0 +1,124 @@
+"""Report the progress of a long run on stderr.
+
+On a terminal, one status line is redrawn in place. Otherwise, as in CI logs, a
+JSON line is written at each update instead. Updates are throttled, so counting
+costs one clock read per file.
+"""
+
+from __future__ import annotations
+
+import dataclasses as dc
+import json
+import sys
+import time
+from typing import Any, TextIO
+
+# Seconds between updates, on a terminal and otherwise
+TTY_INTERVAL = 0.25
+JSON_INTERVAL = 10.0
+
+_CLEAR = '\r\x1b[K'
+
+
+@dc.dataclass
+class Progress:
+    stream: TextIO = dc.field(default_factory=lambda: sys.stderr)
+
+    # If True, write JSON lines: None means only if `stream` is not a terminal
+    as_json: bool | None = None
+
+    # Seconds between updates: None means the default for the kind of output
+    interval: float | None = None
+
+    # What is being done now, and how many files it will take, if known
+    stage: str = ''
+    total: int = 0
+
+    # Counts for the current stage
+    files: int = 0
+    messages: int = 0
+    edits: int = 0
+
+    def __post_init__(self) -> None:
+        if self.as_json is None:
+            self.as_json = not self.stream.isatty()
+        if self.interval is None:
+            self.interval = JSON_INTERVAL if self.as_json else TTY_INTERVAL
+        self._start = self._next = time.monotonic()
+        self._shown = False
+
+    def start(self, stage: str, total: int = 0) -> None:
+        """Finish the current stage, if any, and start counting a new one"""
+        self.finish()
+        self.stage, self.total = stage, total
+        self.files = self.messages = self.edits = 0
+        self._start = now = time.monotonic()
+        self._report(now)
+
+    def advance(self, files: int = 1, messages: int = 0, edits: int = 0) -> None:
+        self.files += files
+        self.messages += messages
+        self.edits += edits
+        if (now := time.monotonic()) >= self._next:
+            self._report(now)
+
+    def finish(self) -> None:
+        """Report the final counts of the current stage"""
+        if self.stage:
+            self._report(time.monotonic())
+            if self._shown:
+                self.stream.write('\n')
+                self._shown = False
+            self.stage = ''
+
+    def print(self, *args: Any) -> None:
+        """Print a line to the stream without garbling the status line"""
+        if self._shown:
+            self.stream.write(_CLEAR)
+            self._shown = False
+            self._next = 0.0  # Redraw it at the next update
+        print(*args, file=self.stream)
+
+    def status(self, now: float | None = None) -> dict[str, Any]:
+        secs = max((time.monotonic() if now is None else now) - self._start, 1e-6)
+        rate = self.files / secs
+        eta = None
+        if self.total and rate:
+            eta = round(max(self.total - self.files, 0) / rate, 1)
+        return {
+            'stage': self.stage,
+            'files': self.files,
+            'total': self.total,
+            'messages': self.messages,
+            'edits': self.edits,
+            'seconds': round(secs, 3),
+            'files_per_second': round(rate, 1),
+            'messages_per_second': round(self.messages / secs, 1),
+            'edits_per_second': round(self.edits / secs, 1),
+            'eta': eta,
+        }
+
+    def _report(self, now: float) -> None:
+        assert self.interval is not None
+        self._next = now + self.interval
+        s = self.status(now)
+        if self.as_json:
+            self.stream.write(json.dumps(s) + '\n')
+        else:
+            self.stream.write(_CLEAR + _format(s))
+            self._shown = True
+        self.stream.flush()
+
+
+def _format(s: dict[str, Any]) -> str:
+    files = f'{s["files"]}/{s["total"]}' if s['total'] else str(s['files'])
+    parts = [
+        f'{s["stage"]}: {files} files',
+        f'{s["files_per_second"]:.1f} files/s',
+        f'{s["messages_per_second"]:.1f} messages/s',
+        f'{s["edits_per_second"]:.1f} edits/s',
+        f'{s["seconds"]:.1f}s',
+    ]
+    if (eta := s['eta']) is not None:
+        parts.append(f'ETA {int(eta) // 60}:{int(eta) % 60:02}')
+    return ', '.join(parts)
@@ -0,0 +1,273 @@
+"""Which symbols are part of a package's public API.
+
+A module is public if no part of its dotted name starts with a single underscore.
+A name in a public module is public if it is in the module's `__all__`, or if the
+module has no `__all__` and the name does not start with an underscore. A name in a
+private module is public if a public package re-exports it from an `__init__.py`.
+See https://github.com/pytorch/pytorch/wiki/Public-API-definition-and-documentation
+
+Each `__init__.py` and `__all__` is parsed once, with `ast`, and only for the
+packages around the files asked about. The files themselves are only read when
+they mention `__all__`, and are never tokenized, so messages can be dropped before
+the rules see them.
+"""
+
+from __future__ import annotations
+
+import ast
+import dataclasses as dc
+import os
+from collections.abc import Iterator
+from pathlib import Path
+
+from .blocks.python_file import is_public
+from .message import Message
+
+Module = tuple[str, ...]
+
+# How many imports to follow from a re-export back to where a name is defined
+MAX_HOPS = 8
+
+
+@dc.dataclass
+class Summary:
+    """What one module says about its names, from its top-level statements"""
+
+    # The names in `__all__`, or None if there is none, or it is not a literal
+    all: frozenset[str] | None = None
+
+    # Each name imported from another module, as the module and the name there
+    imports: dict[str, tuple[Module, str]] = dc.field(default_factory=dict)
+
+    # The modules imported with `from module import *`
+    stars: list[Module] = dc.field(default_factory=list)
+
+    # The names defined or imported at the top level
+    names: set[str] = dc.field(default_factory=set)
+
+    @property
+    def exports(self) -> Iterator[str]:
+        """The names this module makes public"""
+        if self.all is not None:
+            yield from self.all
+        else:
+            yield from (n for n in self.names if is_public(n))
+
+
+class PublicApi:
+    """Resolves and caches the public surface of each package it is asked about"""
+
+    def __init__(self) -> None:
+        self._packages: dict[Path, tuple[Path, Module]] = {}
+        self._summaries: dict[tuple[Path, Module], Summary | None] = {}
+        self._alls: dict[tuple[Path, Module], frozenset[str] | None] = {}
+        self._reexports: dict[tuple[Path, Module], set[tuple[Module, str]]] = {}
+        self._reexported_names: dict[tuple[Path, Module], set[str]] = {}
+
+    def accept(self, message: Message) -> bool:
+        return self.is_public(message.file, message.name)
+
+    def is_public(self, file: str | Path, name: str) -> bool:
+        """Is `name`, a dotted name in `file` like `Class.method`, public?
+
+        A name qualified by its module, as type checkers report it, is also allowed.
+        If `name` is empty, this is whether anything in the file could be public.
+        """
+        root, module = self.module(file)
+        prefix = '.'.join(module) + '.'
+        if name.startswith(prefix):
+            name = name[len(prefix) :]
+        elif module and name.startswith(module[0] + '.'):
+            # Reported under the public name that it is exported as
+            return is_public(name)
+        if not name:
+            return self.may_be_public(file)
+
+        top, *rest = name.split('.')
+        if not is_public(*rest):
+            return False
+        if top in self._reexported(root, module):
+            return True
+        if not is_public(*module):
+            return False
+        if (names := self._all(root, module)) is not None:
+            return top in names
+        return is_public(top)
+
+    def may_be_public(self, file: str | Path) -> bool:
+        """Could any name in `file` be public? Files that fail can be skipped."""
+        root, module = self.module(file)
+        return is_public(*module) or bool(self._reexported(root, module))
+
+    def module(self, file: str | Path) -> tuple[Path, Module]:
+        """The directory that imports start from, and the module that `file` is"""
+        path = Path(os.path.abspath(file))
+        root, package = self._package(path.parent)
+        if path.name == '__init__.py' and package:
+            return root, package
+        return root, (*package, path.stem)
+
+    def _package(self, directory: Path) -> tuple[Path, Module]:
+        if (result := self._packages.get(directory)) is None:
+            if (directory / '__init__.py').exists() and directory.parent != directory:
+                root, package = self._package(directory.parent)
+                result = root, (*package, directory.name)
+            else:
+                result = directory, ()
+            self._packages[directory] = result
+        return result
+
+    def _reexported(self, root: Path, module: Module) -> set[str]:
+        """The names of `module` re-exported by the public packages around it"""
+        key = root, module
+        if (names := self._reexported_names.get(key)) is None:
+            names = set()
+            for i in range(1, len(module)):
+                if is_public(*(package := module[:i])):
+                    origins = self._package_reexports(root, package)
+                    names.update(n for m, n in origins if m == module)
+            self._reexported_names[key] = names
+        return names
+
+    def _package_reexports(
+        self, root: Path, package: Module
+    ) -> set[tuple[Module, str]]:
+        """Every module and name that a package's exports come from"""
+        key = root, package
+        if (result := self._reexports.get(key)) is None:
+            result = set()
+            if (summary := self._summary(root, package)) is not None:
+                for name in summary.exports:
+                    result.update(self._origins(root, package, name))
+            self._reexports[key] = result
+        return result
+
+    def _origins(
+        self, root: Path, module: Module, name: str
+    ) -> Iterator[tuple[Module, str]]:
+        """Follow the imports of `name` back to where it is defined"""
+        for _ in range(MAX_HOPS):
+            if (summary := self._summary(root, module)) is None:
+                return
+            if (source := summary.imports.get(name)) is None:
+                stars = (s for s in summary.stars if self._has_name(root, s, name))
+                if (star := next(stars, None)) is None:
+                    return
+                source = star, name
+            yield source
+            module, name = source
+
+    def _has_name(self, root: Path, module: Module, name: str) -> bool:
+        summary = self._summary(root, module)
+        return summary is not None and name in summary.names
+
+    def _all(self, root: Path, module: Module) -> frozenset[str] | None:
+        key = root, module
+        if key not in self._alls:
+            names = None
+            if (path := _find(root, module)) and b'__all__' in path.read_bytes():
+                if (summary := self._summary(root, module)) is not None:
+                    names = summary.all
+            self._alls[key] = names
+        return self._alls[key]
+
+    def _summary(self, root: Path, module: Module) -> Summary | None:
+        key = root, module
+        if key not in self._summaries:
+            summary = None
+            if (path := _find(root, module)) is not None:
+                try:
+                    tree = ast.parse(path.read_bytes(), str(path))
+                except (SyntaxError, ValueError):
+                    pass
+                else:
+                    is_package = path.name == '__init__.py'
+                    summary = _summarize(tree, module if is_package else module[:-1])
+            self._summaries[key] = summary
+        return self._summaries[key]
+
+
+def _find(root: Path, module: Module) -> Path | None:
+    """The file for a module, or None if it is not under `root`"""
+    if not module:
+        return None
+    if (init := root.joinpath(*module, '__init__.py')).is_file():
+        return init
+    if (path := root.joinpath(*module[:-1], module[-1] + '.py')).is_file():
+        return path
+    return None
+
+
+def _summarize(tree: ast.Module, package: Module) -> Summary:
+    """Summarize the top-level statements of a module in `package`"""
+    s = Summary()
+    all_: list[str] = []
+    has_all, known = False, True
+    for node in tree.body:
+        if (change := _all_change(node)) is not None:
+            has_all = True
+            replace, value = change
+            if (names := _literal_names(value)) is None:
+                known = False
+            else:
+                all_ = names if replace else [*all_, *names]
+        elif isinstance(node, ast.ImportFrom):
+            base = package[: len(package) - node.level + 1] if node.level else ()
+            source = (*base, *node.module.split('.')) if node.module else base
+            for alias in node.names:
+                if alias.name == '*':
+                    s.stars.append(source)
+                else:
+                    as_ = alias.asname or alias.name
+                    s.imports[as_] = source, alias.name
+                    s.names.add(as_)
+        elif isinstance(node, ast.Import):
+            s.names.update((a.asname or a.name).partition('.')[0] for a in node.names)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            s.names.add(node.name)
+        elif isinstance(node, ast.Assign):
+            s.names.update(t.id for t in node.targets if isinstance(t, ast.Name))
+        elif isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name):
+            s.names.add(node.target.id)
+
+    if has_all and known:
+        s.all = frozenset(all_)
+    return s
+
+
+def _all_change(node: ast.stmt) -> tuple[bool, ast.expr] | None:
+    """If a statement changes `__all__`, whether it replaces it, and the new names"""
+    if isinstance(node, ast.Assign):
+        if any(_is_all(t) for t in node.targets):
+            return True, node.value
+    elif isinstance(node, ast.AnnAssign):
+        if _is_all(node.target) and node.value is not None:
+            return True, node.value
+    elif isinstance(node, ast.AugAssign):
+        if _is_all(node.target):
+            return False, node.value
+    elif isinstance(node, ast.Expr) and isinstance(call := node.value, ast.Call):
+        f = call.func
+        if isinstance(f, ast.Attribute) and _is_all(f.value) and len(call.args) == 1:
+            if f.attr == 'extend':
+                return False, call.args[0]
+            if f.attr == 'append':
+                return False, ast.Tuple(elts=call.args, ctx=ast.Load())
+    return None
+
+
+def _is_all(node: ast.expr) -> bool:
+    return isinstance(node, ast.Name) and node.id == '__all__'
+
+
+def _literal_names(node: ast.expr) -> list[str] | None:
+    """The strings in a literal list, tuple or set, or None if it is anything else"""
+    try:
+        value = ast.literal_eval(node)
+    except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+        return None
+    if not isinstance(value, (list, tuple, set)):
+        return None
+    if not all(isinstance(v, str) for v in value):
+        return None
+    return list(value)
@@ -1,15 +1,21 @@
 from __future__ import annotations
 
 import dataclasses as dc
+import functools
+import hashlib
 import re
+import sys
 from collections.abc import Iterator, Sequence
-from functools import cached_property
+from operator import itemgetter
 from pathlib import Path
+from types import CodeType
 from typing import Any, Protocol, runtime_checkable
 
 from .blocks.python_file import PythonFile
+from .concurrency import cached_property
 from .importer import Importer, import_dict
-from .message import Message
+from .message import Dedupe, Message
+from .prefetch import read_ahead
 from .type_edit import TypeEdit
 
 PREFIX = 'fixo.rules'
@@ -51,18 +57,45 @@ class Rule:
     message_to_edits: MessageToEdits
 
     def edits(self, file_messages: dict[str, list[Message]]) -> Iterator[TypeEdit]:
-        for file, messages in file_messages.items():
-            pf = PythonFile(path=Path(file))
-            for m in messages:
-                if (a := self.accept_message(m, self)) is not None:
-                    yield from self.message_to_edits(pf, m, self, a)
-
-    def file_messages(self, contents: str) -> dict[str, list[Message]]:
+        items = read_ahead(file_messages.items(), itemgetter(0))
+        for (file, messages), data in items:
+            pf = PythonFile(path=Path(file), data=data)
+            yield from self.file_edits(pf, messages)
+
+    def file_edits(
+        self, pf: PythonFile, messages: Sequence[Message]
+    ) -> Iterator[TypeEdit]:
+        """Edits for the messages of a single file, which `pf` must hold"""
+        for m in messages:
+            if (a := self.accept_message(m, self)) is not None:
+                yield from self.message_to_edits(pf, m, self, a)
+
+    def file_messages(
+        self, contents: str, dedupe: Dedupe | None = None
+    ) -> dict[str, list[Message]]:
+        """Parse messages by file, dropping duplicates: pass in `dedupe` to find
+        out how many were dropped
+        """
+        dedupe = Dedupe() if dedupe is None else dedupe
         file_messages: dict[str, list[Message]] = {}
-        for message in self.parse_into_messages(contents):
+        for message in dedupe(self.parse_into_messages(contents)):
             file_messages.setdefault(message.file, []).append(message)
         return dict(sorted(file_messages.items()))
 
+    @cached_property
+    def fingerprint(self) -> str:
+        """Changes if the data or the code of the rule's callables change, including
+        anything else in the modules that define them, like helper functions
+        """
+        parts = [self.name_match, self.type_name, *self.categories]
+        for f in (self.parse_into_messages, self.accept_message, self.message_to_edits):
+            parts.append(module := getattr(f, '__module__', ''))
+            parts.append(_module_hash(module))
+            parts.append(getattr(f, '__qualname__', type(f).__qualname__))
+            if code := getattr(f, '__code__', None):
+                parts.extend(_code_parts(code))
+        return hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+
     @cached_property
     def matches(self) -> re.Pattern:
         return re.compile(self.name_match)
@@ -104,3 +137,22 @@ class Rule:
             Importer[AcceptMessage]()(PREFIX, accept_message),
             Importer[MessageToEdits]()(PREFIX, message_to_edits),
         )
+
+
+@functools.cache
+def _module_hash(module: str) -> str:
+    """A hash of a module's source, or '' if it has none"""
+    file = getattr(sys.modules.get(module), '__file__', None)
+    try:
+        data = Path(file).read_bytes() if file else b''
+    except OSError:
+        data = b''
+    return hashlib.blake2b(data, digest_size=16).hexdigest() if data else ''
+
+
+def _code_parts(code: CodeType) -> Iterator[Any]:
+    # The repr of a code object contains its address, so recurse instead
+    yield code.co_code
+    yield code.co_names
+    for c in code.co_consts:
+        yield from _code_parts(c) if isinstance(c, CodeType) else (c,)
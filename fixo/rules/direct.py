@@ -0,0 +1,71 @@
+"""Find missing annotations straight from the source, without a type checker.
+
+The "checker output" for this backend is just a list of Python files, one per line.
+"""
+
+import re
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+from ..blocks.python_file import PythonFile
+from ..message import Category, LineCharacter, Message
+from ..rule import Rule
+from ..type_edit import TypeEdit
+
+type_command_string = ''
+
+# All of a file's messages come together in the output
+grouped_by_file = True
+
+
+def scan_file(pf: PythonFile) -> Iterator[Message]:
+    """Yield a message for each missing param or return annotation in a file"""
+    for b in pf.blocks:
+        if b.is_class:
+            continue
+        name, file = b.full_name, str(pf.path)
+        category = Category.method if b.is_method else Category.function
+
+        def msg(index: int, message: str) -> Message:
+            t = pf.tokens[index]
+            start, end = (LineCharacter(*p) for p in (t.start, t.end))
+            return Message(
+                message=message,
+                start=start,
+                end=end,
+                name=name,
+                file=file,
+                severity='',
+                category=category,
+            )
+
+        params, returns = b.signature
+        if not returns:
+            yield msg(b.begin + 1, '')
+        for p in params:
+            if not p.annotated:
+                yield msg(p.index, p.name)
+
+
+def parse_into_messages(contents: str) -> Iterator[Message]:
+    for line in contents.splitlines():
+        if line := line.strip():
+            yield from scan_file(PythonFile(path=Path(line)))
+
+
+def accept_message(msg: Message, rule: Rule) -> dict[str, Any] | None:
+    if rule.categories and msg.category not in rule.categories:
+        return None
+    return {'param': msg.message}
+
+
+def message_to_edits(
+    pf: PythonFile,
+    message: Message,
+    rule: Rule,
+    accept: dict[str, Any],
+) -> Iterator[TypeEdit]:
+    param = accept['param']
+    if re.match(rule.name_match, param or message.base_name):
+        yield TypeEdit(message.name, rule.type_name, param)
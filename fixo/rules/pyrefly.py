@@ -10,10 +10,16 @@ from ..type_edit import TypeEdit
 
 type_command_string = 'pyrefly report'
 
+# All of a file's messages come together in the output
+grouped_by_file = True
+
 
 def parse_into_messages(contents: str) -> Iterator[Message]:
     d = json.loads(contents)
-    for file, file_contents in d.items():
+    del contents  # Only the parsed report is needed from here on
+    for file in list(d):
+        # Each file's part of the report is released once its messages are made
+        file_contents = d.pop(file)
         for func in file_contents['functions']:
             name = func['name']
             kw = {'name': name, 'file': file, 'severity': ''}
@@ -12,9 +12,17 @@ from ..type_edit import TypeEdit
 
 type_command_string = 'pyright --ignoreexternal --outputjson --verifytypes'
 
+# --verifytypes takes a package, not a list of files, so every round checks it all
+checks_package = True
+
 
 def parse_into_messages(contents: str) -> Iterator[Message]:
-    for symbol in json.loads(contents)['typeCompleteness']['symbols']:
+    symbols = json.loads(contents)['typeCompleteness']['symbols']
+    del contents  # Only the parsed report is needed from here on
+    # Each symbol is released once its messages are made
+    symbols.reverse()
+    while symbols:
+        symbol = symbols.pop()
         base = {'name': symbol['name']}
         for diag in symbol['diagnostics']:
             range_: dict[str, Any] = diag.pop('range', None)
@@ -0,0 +1,121 @@
+"""A SQLite store of edits, so edits can be selected, accepted or rejected
+without reading or rewriting one huge edits file.
+"""
+
+from __future__ import annotations
+
+import itertools
+import sqlite3
+from collections.abc import Iterable, Iterator
+from enum import Enum
+from pathlib import Path
+from typing import Any
+
+from .type_edit import TypeEdit
+
+SUFFIXES = '.db', '.sqlite'
+
+# Columns which can appear in a `where` clause, and their TypeEdit field names
+COLUMNS = {
+    'rule': 'rule',
+    'file': 'file',
+    'function': 'function_name',
+    'param': 'param',
+    'type': 'type_name',
+    'prefer_as': 'prefer_as',
+    'fingerprint': 'fingerprint',
+}
+
+_FIELDS = {c: f for c, f in COLUMNS.items() if c != 'file'}
+_INDEXED = 'rule', 'file', 'function', 'param', 'type', 'status'
+
+_CREATE = f"""
+CREATE TABLE IF NOT EXISTS edits (
+    id INTEGER PRIMARY KEY,
+    rule TEXT NOT NULL,
+    file TEXT NOT NULL,
+    function TEXT NOT NULL,
+    param TEXT NOT NULL,
+    type TEXT NOT NULL,
+    prefer_as INTEGER NOT NULL,
+    fingerprint TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    UNIQUE (file, function, param, type, rule)
+);
+{''.join(f'CREATE INDEX IF NOT EXISTS edits_{c} ON edits ({c});' for c in _INDEXED)}
+"""
+
+
+class Status(str, Enum):
+    pending = 'pending'
+    accepted = 'accepted'
+    rejected = 'rejected'
+
+
+class EditStore:
+    def __init__(self, path: Path | str) -> None:
+        self.db = sqlite3.connect(path)
+        self.db.executescript(_CREATE)
+
+    def close(self) -> None:
+        self.db.close()
+
+    def add(self, file_edits: Iterable[tuple[str, Iterable[TypeEdit]]]) -> int:
+        """Add edits, keeping the status of any edits which are already stored"""
+        rows = (
+            {'file': file} | {c: getattr(e, f) for c, f in _FIELDS.items()}
+            for file, edits in file_edits
+            for e in edits
+        )
+        names = ', '.join(COLUMNS)
+        values = ', '.join(f':{c}' for c in COLUMNS)
+        sql = f'INSERT OR IGNORE INTO edits ({names}) VALUES ({values})'
+        with self.db:
+            return self.db.executemany(sql, rows).rowcount
+
+    def mark(self, status: Status, where: str = '') -> int:
+        """Set the status of every selected edit, and return how many there were"""
+        with self.db:
+            sql = f'UPDATE edits SET status = ?{_where(where)}'
+            return self.db.execute(sql, (status.value,)).rowcount
+
+    def select(self, where: str = '') -> Iterator[dict[str, Any]]:
+        names = ', '.join((*COLUMNS, 'status'))
+        sql = f'SELECT {names} FROM edits{_where(where)} ORDER BY file, id'
+        cursor = self.db.execute(sql)
+        for row in cursor:
+            yield dict(zip((*COLUMNS, 'status'), row))
+
+    def files(self, where: str = '', status: Status | None = None) -> list[str]:
+        """The files with selected edits, only those with `status` if it is set"""
+        where = _with_status(where, status)
+        sql = f'SELECT DISTINCT file FROM edits{_where(where)} ORDER BY file'
+        return [f for (f,) in self.db.execute(sql)]
+
+    def accepted(self, where: str = '') -> Iterator[tuple[str, list[TypeEdit]]]:
+        """Stream the accepted edits, grouped by file"""
+        rows = self.select(_with_status(where, Status.accepted))
+        for file, group in itertools.groupby(rows, lambda r: r['file']):
+            yield file, [_to_edit(r) for r in group]
+
+
+def _where(where: str) -> str:
+    return f' WHERE {where}' if where else ''
+
+
+def _with_status(where: str, status: Status | None) -> str:
+    if status is None:
+        return where
+    is_status = f"status = '{status.value}'"
+    return f'{is_status} AND ({where})' if where else is_status
+
+
+def _to_edit(row: dict[str, Any]) -> TypeEdit:
+    return TypeEdit(
+        function_name=str(row['function']),
+        type_name=str(row['type']),
+        param=str(row['param']),
+        prefer_as=bool(row['prefer_as']),
+        rule=str(row['rule']),
+        fingerprint=str(row['fingerprint']),
+    )
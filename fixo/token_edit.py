@@ -1,9 +1,13 @@
 from __future__ import annotations
 
 import dataclasses as dc
-from collections.abc import Iterable
+import token
+from collections.abc import Iterable, Sequence
 from tokenize import TokenInfo, Untokenizer
 
+# Text inserted after these goes at the start of the next line
+_LINE_START = token.NEWLINE, token.NL, token.INDENT, token.DEDENT
+
 
 @dc.dataclass(frozen=True, order=True)
 class TokenEdit:
@@ -19,12 +23,29 @@ class TokenEdit:
     text: str
 
 
-def perform_edits(edits: Iterable[TokenEdit], tokens: Iterable[TokenInfo]) -> str:
-    """Renders the TokenInfos and TokenEdits for one file into a single string"""
+def perform_edits(
+    edits: Iterable[TokenEdit],
+    tokens: Sequence[TokenInfo],
+    lines: Sequence[str] | None = None,
+) -> str:
+    """Renders the TokenInfos and TokenEdits for one file into a single string.
+
+    With the `lines` the tokens came from, the text is inserted into them and the
+    rest of the file is kept exactly. Otherwise the tokens are untokenized, which
+    can change whitespace like form feeds or tabs.
+    """
     text_by_position: dict[int, dict[str, None]] = {}
     for e in edits:
         text_by_position.setdefault(e.position, {}).setdefault(e.text, None)
 
+    if lines is not None:
+        inserts = (
+            (*insert_position(tokens, position), text)
+            for position in sorted(text_by_position)
+            for text in text_by_position[position]
+        )
+        return insert_texts(lines, inserts)
+
     u = Untokenizer()
 
     def edit_inserter() -> Iterable[TokenInfo]:
@@ -34,3 +55,43 @@ def perform_edits(edits: Iterable[TokenEdit], tokens: Iterable[TokenInfo]) -> st
             yield t
 
     return u.untokenize(edit_inserter())
+
+
+def insert_position(tokens: Sequence[TokenInfo], position: int) -> tuple[int, int]:
+    """The line number and column where text inserted at token `position` goes.
+
+    The Untokenizer puts inserted text right after the token before, except that
+    indentation goes after it.
+    """
+    prev = tokens[position - 1] if position else None
+    if prev is None or prev.type in _LINE_START:
+        return tokens[position].start[0], 0
+    return prev.end
+
+
+def insert_texts(
+    lines: Sequence[str], inserts: Iterable[tuple[int, int, str]], first_row: int = 1
+) -> str:
+    """Insert each (line number, column, text) into `lines`, which begin at line
+    `first_row`. Texts at the same place stay in order.
+    """
+    by_row: dict[int, list[tuple[int, str]]] = {}
+    for row, col, text in inserts:
+        by_row.setdefault(row, []).append((col, text))
+
+    result = list(lines)
+    for row, row_inserts in by_row.items():
+        i = row - first_row
+        # The ENDMARKER is on the line after the last one
+        result.extend('' for _ in range(len(result), i + 1))
+        old = result[i]
+        parts: list[str] = []
+        prev = 0
+        # Stable, so texts at the same column stay in order
+        for col, text in sorted(row_inserts, key=lambda i: i[0]):
+            parts += old[prev:col], text
+            prev = col
+        parts.append(old[prev:])
+        result[i] = ''.join(parts)
+
+    return ''.join(result)
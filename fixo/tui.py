@@ -0,0 +1,321 @@
+"""A terminal interface to choose which edits in an edits file to accept.
+
+The edits file is never parsed as a whole: it is scanned once for where each edit
+begins and ends, and an edit is only decoded when it is drawn or selected. Only the
+rows on the screen are drawn, so the interface stays responsive with 100k edits.
+
+The accepted edits are written to a new edits file by copying their text from the
+original one, which is never overwritten, so the edits still pending are kept.
+"""
+
+from __future__ import annotations
+
+import difflib
+import functools
+import itertools
+import json
+import re
+from array import array
+from collections.abc import Callable, Iterable, Iterator
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from .blocks.python_file import PythonFile
+from .store import Status
+from .type_edit import TypeEdit
+
+try:
+    import curses
+except ImportError:  # Windows, without the windows-curses package
+    curses = None  # type: ignore[assignment]
+
+if TYPE_CHECKING:
+    from curses import window
+
+# Lines of source around each change
+CONTEXT = 3
+
+# How many decoded edits and parsed files to keep
+EDITS_CACHE = 4096
+FILES_CACHE = 16
+
+STATUSES = list(Status)
+_MARKS = {Status.pending: ' ', Status.accepted: '+', Status.rejected: '-'}
+
+_HELP = (
+    'j/k move  a accept  r reject  u undo  A/R accept/reject by rule, file or regex'
+    '  w write  q quit'
+)
+
+# Strings and brackets: a string can contain brackets, but not an unescaped quote
+_TOKEN_RE = re.compile(rb'"(?:[^"\\]|\\.)*"|[][{}]')
+
+
+class EditsFile:
+    """An edits file, as written by fixo: a JSON object mapping each file name to a
+    list of edits
+    """
+
+    def __init__(self, path: Path | str) -> None:
+        self.path = Path(path)
+        self.data = self.path.read_bytes()
+
+        # The file names, and for each edit, the index of its file name
+        self.files: list[str] = []
+        self.file_index = array('L')
+
+        # Where the text of each edit begins and ends in `data`
+        self.begins = array('Q')
+        self.ends = array('Q')
+
+        self._scan()
+        self.status = bytearray(len(self))
+        self.edit = functools.lru_cache(EDITS_CACHE)(self._decode)
+
+    def __len__(self) -> int:
+        return len(self.begins)
+
+    def file(self, i: int) -> str:
+        return self.files[self.file_index[i]]
+
+    def summary(self, i: int, edit: TypeEdit | None = None) -> str:
+        """A one-line description of an edit"""
+        e = edit or self.edit(i)
+        target = f'({e.param})' if e.param else ''
+        return f'{self.file(i)}: {e.function_name}{target} -> {e.type_name} [{e.rule}]'
+
+    def get_status(self, i: int) -> Status:
+        return STATUSES[self.status[i]]
+
+    def mark(self, indexes: Iterable[int], status: Status) -> int:
+        """Set the status of edits, and return how many were set"""
+        code = STATUSES.index(status)
+        count = 0
+        for i in indexes:
+            self.status[i] = code
+            count += 1
+        return count
+
+    def by_file(self, file: str) -> Iterator[int]:
+        if file in self.files:
+            n = self.files.index(file)
+            yield from (i for i, f in enumerate(self.file_index) if f == n)
+
+    def by_rule(self, rule: str) -> Iterator[int]:
+        return (i for i in range(len(self)) if self._decode(i).rule == rule)
+
+    def by_regex(self, pattern: str) -> Iterator[int]:
+        """Edits whose summary matches a regular expression"""
+        search = re.compile(pattern).search
+        # Decoded without the cache, which is for the edits on the screen
+        return (i for i in range(len(self)) if search(self.summary(i, self._decode(i))))
+
+    def write(self, path: Path | str) -> int:
+        """Write the accepted edits to another file, and return how many there were"""
+        if Path(path).resolve() == self.path.resolve():
+            raise ValueError(f'Would overwrite the edits file {self.path}')
+        accepted = STATUSES.index(Status.accepted)
+        chosen = (i for i in range(len(self)) if self.status[i] == accepted)
+        parts: list[bytes] = []
+        count = 0
+        for n, group in itertools.groupby(chosen, self.file_index.__getitem__):
+            edits = [self.data[self.begins[i] : self.ends[i]] for i in group]
+            count += len(edits)
+            name = json.dumps(self.files[n]).encode()
+            body = b',\n        '.join(edits)
+            parts.append(b'\n    %s: [\n        %s\n    ]' % (name, body))
+
+        text = b'{' + b','.join(parts) + (b'\n}\n' if parts else b'}\n')
+        Path(path).write_bytes(text)
+        return count
+
+    def _scan(self) -> None:
+        depth = 0
+        begin = 0
+        for m in _TOKEN_RE.finditer(self.data):
+            c = self.data[m.start()]
+            if c == ord('"'):
+                if depth == 1:
+                    self.files.append(json.loads(m.group()))
+            elif c in b'[{':
+                depth += 1
+                if depth == 3:
+                    begin = m.start()
+            else:
+                if depth == 3:
+                    self.begins.append(begin)
+                    self.ends.append(m.end())
+                    self.file_index.append(len(self.files) - 1)
+                depth -= 1
+
+    def _decode(self, i: int) -> TypeEdit:
+        return TypeEdit(**json.loads(self.data[self.begins[i] : self.ends[i]]))
+
+
+class Context:
+    """Renders the change an edit makes as a unified diff, reusing the PythonFiles
+    of the most recently shown files
+    """
+
+    def __init__(self, lines: int = CONTEXT) -> None:
+        self.lines = lines
+        self.python_file = functools.lru_cache(FILES_CACHE)(self._python_file)
+
+    def __call__(self, file: str, edit: TypeEdit) -> list[str]:
+        try:
+            pf = self.python_file(file)
+            new = pf.patched(edit.apply(pf))
+        except Exception as e:
+            return [f'ERROR: {" ".join(str(a) for a in e.args)}']
+
+        diff = difflib.unified_diff(
+            pf.lines, new.lines, f'a/{file}', f'b/{file}', n=self.lines
+        )
+        return [line.rstrip('\n') for line in diff] or ['Already made']
+
+    @staticmethod
+    def _python_file(file: str) -> PythonFile:
+        return PythonFile(path=Path(file))
+
+
+class Tui:
+    """Lists the edits in the top half of the screen, and the change the current
+    one makes in the bottom half
+    """
+
+    def __init__(
+        self, edits: EditsFile, output: Path, context: Context | None = None
+    ) -> None:
+        self.edits = edits
+        self.output = output
+        self.context = context or Context()
+        self.cursor = 0
+        self.top = 0
+        self.message = f'{len(edits)} edits in {len(edits.files)} files'
+        self.changed = False
+
+    def run(self, screen: window) -> None:
+        assert curses is not None
+        curses.curs_set(0)
+        curses.use_default_colors()
+        for n, color in enumerate((curses.COLOR_GREEN, curses.COLOR_RED), 1):
+            curses.init_pair(n, color, -1)
+
+        keys: dict[str, Callable[[window], Any]] = {
+            'a': lambda s: self._mark_current(Status.accepted),
+            'r': lambda s: self._mark_current(Status.rejected),
+            'u': lambda s: self._mark_current(Status.pending),
+            'A': lambda s: self._bulk(s, Status.accepted),
+            'R': lambda s: self._bulk(s, Status.rejected),
+            'w': self._write,
+        }
+        while True:
+            self._draw(screen)
+            key = screen.getkey()
+            if key == 'q' and self._quit(screen):
+                return
+            if action := keys.get(key):
+                action(screen)
+            else:
+                self._move(screen, key)
+
+    def _draw(self, screen: window) -> None:
+        assert curses is not None
+        height, width = screen.getmaxyx()
+        rows = self._rows(screen)
+        self.top = min(max(self.top, self.cursor - rows + 1), self.cursor)
+
+        screen.erase()
+        for y, i in enumerate(range(self.top, min(self.top + rows, len(self.edits)))):
+            mark = _MARKS[self.edits.get_status(i)]
+            attr = curses.A_REVERSE if i == self.cursor else curses.A_NORMAL
+            screen.addnstr(y, 0, f'{mark} {self.edits.summary(i)}', width - 1, attr)
+
+        if len(self.edits):
+            file, edit = self.edits.file(self.cursor), self.edits.edit(self.cursor)
+            lines = self.context(file, edit)
+            for y, line in enumerate(lines[: height - rows - 3], rows + 1):
+                color = {'+': 1, '-': 2}.get(line[:1], 0)
+                screen.addnstr(y, 0, line, width - 1, curses.color_pair(color))
+
+        screen.addnstr(height - 2, 0, self.message, width - 1, curses.A_BOLD)
+        screen.addnstr(height - 1, 0, _HELP, width - 1)
+        screen.refresh()
+
+    def _rows(self, screen: window) -> int:
+        return max(1, (screen.getmaxyx()[0] - 2) // 2)
+
+    def _move(self, screen: window, key: str) -> None:
+        page = self._rows(screen)
+        moves = {'j': 1, 'k': -1, 'KEY_DOWN': 1, 'KEY_UP': -1}
+        moves |= {'KEY_NPAGE': page, 'KEY_PPAGE': -page}
+        moves |= dict.fromkeys(('g', 'KEY_HOME'), -len(self.edits))
+        moves |= dict.fromkeys(('G', 'KEY_END'), len(self.edits))
+        if move := moves.get(key):
+            last = max(len(self.edits) - 1, 0)
+            self.cursor = min(max(self.cursor + move, 0), last)
+
+    def _mark(self, indexes: Iterable[int], status: Status) -> None:
+        count = self.edits.mark(indexes, status)
+        self.changed = True
+        self.message = f'{count} edits {status.value}'
+
+    def _mark_current(self, status: Status) -> None:
+        if len(self.edits):
+            self._mark([self.cursor], status)
+            self.cursor = min(self.cursor + 1, len(self.edits) - 1)
+
+    def _bulk(self, screen: window, status: Status) -> None:
+        if not len(self.edits):
+            return
+        key = self._prompt(screen, f'{status.value} by (r)ule, (f)ile or (/) regex? ')
+        if key == 'r':
+            rule = self.edits.edit(self.cursor).rule
+            self._mark(self.edits.by_rule(rule), status)
+        elif key == 'f':
+            self._mark(self.edits.by_file(self.edits.file(self.cursor)), status)
+        elif key == '/':
+            pattern = self._prompt(screen, 'regex: ', line=True)
+            try:
+                self._mark(self.edits.by_regex(pattern), status)
+            except re.error as e:
+                self.message = f'Bad regex: {e}'
+
+    def _write(self, screen: window) -> None:
+        accepted = self.edits.status.count(STATUSES.index(Status.accepted))
+        question = f'Write {accepted} accepted edits to {self.output}? (y/n) '
+        if self._prompt(screen, question) == 'y':
+            self.edits.write(self.output)
+            self.changed = False
+            self.message = f'{accepted} edits written to {self.output}'
+
+    def _quit(self, screen: window) -> bool:
+        if not self.changed:
+            return True
+        return self._prompt(screen, 'Quit without writing? (y/n) ') == 'y'
+
+    def _prompt(self, screen: window, question: str, line: bool = False) -> str:
+        assert curses is not None
+        height, width = screen.getmaxyx()
+        screen.move(height - 2, 0)
+        screen.clrtoeol()
+        screen.addnstr(height - 2, 0, question, width - 1, curses.A_BOLD)
+        if not line:
+            return screen.getkey()
+
+        curses.echo()
+        curses.curs_set(1)
+        try:
+            return screen.getstr(height - 2, len(question)).decode()
+        finally:
+            curses.noecho()
+            curses.curs_set(0)
+
+
+def choose(path: Path | str, output: Path | str) -> None:
+    """Choose edits from an edits file, and write the accepted ones to `output`"""
+    if curses is None:
+        raise ImportError('The terminal interface needs the curses module')
+    if Path(output).resolve() == Path(path).resolve():
+        raise ValueError('The accepted edits must be written to another file')
+    curses.wrapper(Tui(EditsFile(path), Path(output)).run)
@@ -7,9 +7,13 @@ import typing as ty
 from collections.abc import Iterator
 from typing import Any
 
+from .blocks.block import Block
 from .blocks.python_file import PythonFile
 from .token_edit import TokenEdit, perform_edits
 
+# Before the names of `*args` and `**kwargs`
+_STARS = '*', '**'
+
 
 @dc.dataclass(frozen=True, order=True)
 class TypeEdit:
@@ -27,7 +31,19 @@ class TypeEdit:
     # If True, use `import torch.Tensor as Tensor`, otherwise `from torch import Tensor`
     prefer_as: bool = False
 
+    # The name of the rule that created this edit: informational only
+    rule: str = dc.field(default='', compare=False)
+
+    # The `Block.fingerprint` of the function, used to find it again if
+    # `function_name` no longer points to it after the code has changed
+    fingerprint: str = dc.field(default='', compare=False)
+
     def apply(self, pf: PythonFile) -> Iterator[TokenEdit]:
+        edit_position, annotated = self._edit_position(pf)
+        if annotated:
+            # Already made, for example by an earlier round of edits
+            return
+
         try:
             type_name = next(i for i in pf.imports if i.address == self.type_name).as_
         except StopIteration:
@@ -39,14 +55,34 @@ class TypeEdit:
                     import_line = f'\nfrom {address} import {type_name}\n'
                 yield TokenEdit(pf.insert_import_token, import_line)
 
-        edit_position = self._edit_position(pf)
+        space = '' if self.param else ' '
         sep = ':' if self.param else '->'
-        if pf.tokens[edit_position + 1] != sep:
-            space = '' if self.param else ' '
-            yield TokenEdit(edit_position, f'{space}{sep} {type_name}')
-
-    def _edit_position(self, pf: PythonFile) -> int:
-        b = pf.blocks_by_name[self.function_name]
+        yield TokenEdit(edit_position, f'{space}{sep} {type_name}')
+
+    def block(self, pf: PythonFile) -> Block:
+        """Find the function to edit by its name, unless its fingerprint shows that it
+        moved: then the one block with that fingerprint is used instead. If nothing
+        has the fingerprint, the function itself changed, and the name is kept.
+        """
+        b = pf.blocks_by_name.get(self.function_name)
+        if self.fingerprint and (b is None or b.fingerprint != self.fingerprint):
+            same = pf.blocks_by_fingerprint.get(self.fingerprint, [])
+            if len(same) == 1:
+                return same[0]
+            if same and b is None:
+                raise ValueError(f'Ambiguous fingerprint for {self}: {same}')
+        if b is None:
+            raise ValueError(f'Did not find function for {self}')
+        return b
+
+    def with_fingerprint(self, pf: PythonFile) -> TypeEdit:
+        if b := pf.blocks_by_name.get(self.function_name):
+            return dc.replace(self, fingerprint=b.fingerprint)
+        return self
+
+    def _edit_position(self, pf: PythonFile) -> tuple[int, bool]:
+        """Return where the type goes, and whether there is already a type there"""
+        b = self.block(pf)
         if b.category != 'def':
             raise ValueError(f'Cannot apply a rule {self} to a class {b}')
 
@@ -59,14 +95,20 @@ class TypeEdit:
             t = pf.tokens[i]
             depth += (t.string in ('{', '(', '[')) - (t.string in ('}', ')', ']'))
             if not (self.param or depth):
-                return i + 1
+                return i + 1, pf.tokens[i + 1].string == '->'
             if self.param and (depth == 0 or (depth == 1 and t.string == ',')):
                 for j in range(prev + 1, i):
                     u = pf.tokens[j]
                     if u.string == self.param:
-                        return i
-                    if u.type != token.COMMENT:
+                        # Right after the name, before any default value
+                        return j + 1, pf.tokens[j + 1].string == ':'
+                    if (
+                        u.type not in (token.COMMENT, token.NL)
+                        and u.string not in _STARS
+                    ):
                         break
+                if not depth:
+                    break  # The end of the parameters
                 prev = i
         raise ValueError(f'Did not find {self}')
 
@@ -77,4 +119,4 @@ class TypeEdit:
 def perform_type_edits(type_edits: ty.Iterable[TypeEdit], pf: PythonFile) -> str:
     edits = itertools.chain.from_iterable(e.apply(pf) for e in type_edits)
 
-    return perform_edits(edits, pf.tokens)
+    return perform_edits(edits, pf.tokens, pf.lines)
@@ -0,0 +1,171 @@
+"""Check each edited file before it is written: it must still compile, keep the same
+blocks, and differ from the original only by added annotations and imports.
+
+Files that pass are written to a temporary file next to them, so only the failures
+are held in memory until the temporary files replace the originals.
+"""
+
+from __future__ import annotations
+
+import dataclasses as dc
+import os
+import stat
+import tempfile
+import token
+import traceback
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from concurrent.futures import Executor
+from operator import itemgetter
+from pathlib import Path
+from tokenize import TokenInfo
+
+from .blocks.python_file import PythonFile
+from .prefetch import read_ahead
+from .type_edit import TypeEdit, perform_type_edits
+
+# The tokens which adding an annotation or an import can add
+_ADDED_OPS = {':', '->', '.', ',', '[', ']', '|'}
+_ADDED_TYPES = {token.NAME, token.NEWLINE, token.NL}
+
+# Untokenizing can change the whitespace in these
+_WHITESPACE = {token.DEDENT, token.INDENT, token.NEWLINE, token.NL}
+
+
+class VerifyError(ValueError):
+    pass
+
+
+@dc.dataclass
+class Checked:
+    file: str
+
+    # The temporary file holding the new contents, if they passed
+    temp: str = ''
+
+    # Why the edits could not be made, if they could not
+    error: str = ''
+    traceback: str = ''
+
+    def replace(self) -> None:
+        """Move the new contents over the file"""
+        os.replace(self.temp, self.file)
+
+    def discard(self) -> None:
+        if self.temp:
+            Path(self.temp).unlink(missing_ok=True)
+
+    @staticmethod
+    def failure(file: str, e: Exception) -> Checked:
+        """Record why `file` could not be edited, from where `e` was caught"""
+        error = ' '.join(str(a) for a in e.args)
+        return Checked(file, error=error, traceback=traceback.format_exc())
+
+
+def report(
+    checked: Sequence[Checked], log: Callable[..., None], verbose: bool = False
+) -> None:
+    """Log each file that failed, then how many did, before any file is written"""
+    if failed := [c for c in checked if c.error]:
+        for c in failed:
+            log(f'ERROR: {c.file}:', c.error)
+            if verbose:
+                log(c.traceback)
+        log(f'verify: {len(failed)} of {len(checked)} files failed, unchanged')
+
+
+def verify(before: PythonFile, contents: str) -> None:
+    """Raise a VerifyError if `contents` are not `before` with only annotations and
+    imports added
+    """
+    try:
+        compile(contents, str(before.path), 'exec', dont_inherit=True)
+    except (SyntaxError, ValueError) as e:
+        raise VerifyError(f'Does not compile: {e}') from None
+
+    after = before.with_contents(contents)
+    old = [b.full_name for b in before.blocks]
+    new = [b.full_name for b in after.blocks]
+    if old != new:
+        changed = next((o, n) for o, n in zip([*old, None], [*new, None]) if o != n)
+        raise VerifyError('Blocks changed: {} became {}'.format(*changed))
+
+    if unexpected := _unexpected(before.tokens, after.tokens):
+        what, t = unexpected
+        row, col = t.start
+        raise VerifyError(f'{what} {t.string!r} at line {row}, column {col}')
+
+
+def check_file(
+    file: str, edits: Sequence[TypeEdit], data: bytes | None = None
+) -> Checked:
+    """Render the edits to one file in memory, verify the result, and write it to a
+    temporary file if it passed
+    """
+    pf = PythonFile(path=Path(file), data=data)
+    try:
+        contents = perform_type_edits(edits, pf)
+        verify(pf, contents)
+        return Checked(file, write_temp(file, contents.encode(pf.encoding)))
+    except Exception as e:
+        return Checked.failure(file, e)
+    finally:
+        # Release the file, which is replaced after this returns
+        pf.close()
+
+
+def write_temp(file: str, data: bytes) -> str:
+    """Write `data` to a new file beside `file`, with the same permissions"""
+    path = Path(file)
+    fd, temp = tempfile.mkstemp(
+        prefix=f'.{path.name}.', suffix='.fixo', dir=path.parent
+    )
+    os.close(fd)
+    try:
+        Path(temp).write_bytes(data)
+        os.chmod(temp, stat.S_IMODE(path.stat().st_mode))
+    except BaseException:
+        os.unlink(temp)
+        raise
+    return temp
+
+
+def check_files(
+    file_edits: Iterable[tuple[str, Sequence[TypeEdit]]],
+    executor: Executor | None = None,
+) -> Iterator[Checked]:
+    """Check each file, in the order of `file_edits`, in parallel if there is an
+    executor
+    """
+    if executor is None:
+        for (file, edits), data in read_ahead(file_edits, itemgetter(0)):
+            yield check_file(file, edits, data)
+    else:
+        items = list(file_edits)
+        files, edits = [f for f, _ in items], [e for _, e in items]
+        yield from executor.map(check_file, files, edits, chunksize=16)
+
+
+def _unexpected(
+    before: Sequence[TokenInfo], after: Sequence[TokenInfo]
+) -> tuple[str, TokenInfo] | None:
+    """Find the first token of `after` that is not in `before` and could not be part
+    of an annotation or an import, or else the first token of `before` that is not
+    in `after`
+    """
+    old = iter(before)
+    want = next(old, None)
+    for t in after:
+        if want is not None and _same(t, want):
+            want = next(old, None)
+        elif not (
+            t.type in _ADDED_TYPES or (t.type == token.OP and t.string in _ADDED_OPS)
+        ):
+            # Running into the layout means that `want` went missing before it
+            if want is not None and t.type in _WHITESPACE:
+                return 'Removed', want
+            return 'Added', t
+    return None if want is None else ('Removed', want)
+
+
+def _same(a: TokenInfo, b: TokenInfo) -> bool:
+    return a.type == b.type and (a.type in _WHITESPACE or a.string == b.string)
@@ -0,0 +1,38 @@
+import dataclasses as dc
+from collections.abc import Iterator
+from pathlib import Path
+
+from fixo.blocks.python_file import PythonFile
+from fixo.cache import RuleCache
+from fixo.conflicts import merge
+from fixo.message import Message
+from fixo.pipeline import FileEditor
+from fixo.rules import default_rules, direct
+from fixo.verify import verify
+
+SAMPLE_IN = Path(__file__).parent / 'sample_code.py'
+
+
+def test_rule_cache(tmp_path):
+    rules = default_rules('.direct')
+    cache = RuleCache(tmp_path / 'cache')
+    editor = FileEditor(rules, scan=direct.scan_file, cache=cache)
+
+    expected = editor(str(SAMPLE_IN), [])
+    assert len(list((tmp_path / 'cache').rglob('*.json'))) == len(rules)
+
+    def fail(pf: PythonFile) -> Iterator[Message]:
+        raise AssertionError('Cache missed')
+
+    cached = FileEditor(rules, scan=fail, cache=cache)
+    assert cached(str(SAMPLE_IN), []) == expected
+
+    changed = dict(rules, bools=dc.replace(rules['bools'], type_name='int'))
+    assert changed['bools'].fingerprint != rules['bools'].fingerprint
+
+    # The same code calling different functions is a different rule
+    calls = [dc.replace(rules['bools'], message_to_edits=lambda *a: merge(*a))]
+    calls.append(dc.replace(rules['bools'], message_to_edits=lambda *a: verify(*a)))
+    assert calls[0].fingerprint != calls[1].fingerprint
+    actual = FileEditor(changed, scan=direct.scan_file, cache=cache)(str(SAMPLE_IN), [])
+    assert {e.type_name for e in actual.edits} == {'int', 'torch.Tensor'}
@@ -0,0 +1,61 @@
+import dataclasses as dc
+import pickle
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from fixo.concurrency import cached_property, make_executor
+from fixo.pipeline import Pipeline
+from fixo.rules import default_rules
+from fixo.rules.pyrefly import parse_into_messages
+
+HERE = Path(__file__).parent
+SAMPLE_IN = HERE / 'sample_code.py'
+REPORT = (HERE / 'sample_code.pyrefly.json').read_text()
+
+
+def _messages(file: Path):
+    return [dc.replace(m, file=str(file)) for m in parse_into_messages(REPORT)]
+
+
+def test_engines():
+    rules = default_rules('.pyrefly')
+    messages = _messages(SAMPLE_IN)
+    expected = Pipeline(rules, lambda lines: iter(messages)).run(())
+
+    for engine in ('thread', 'process'):
+        executor = make_executor(2, engine)
+        try:
+            pipeline = Pipeline(rules, lambda lines: iter(messages), executor)
+            assert pipeline.run(()) == expected
+            assert pipeline.run(()) == expected
+        finally:
+            assert executor is not None
+            executor.shutdown()
+
+
+class _Slow:
+    calls = 0
+
+    @cached_property
+    def value(self) -> list[int]:
+        _Slow.calls += 1
+        time.sleep(0.01)
+        return [id(self)]
+
+
+def test_cached_property_threads():
+    barrier = threading.Barrier(8)
+    slows = [_Slow(), _Slow()]
+
+    def get(i: int) -> list[int]:
+        barrier.wait()
+        return slows[i % 2].value
+
+    with ThreadPoolExecutor(8) as executor:
+        values = list(executor.map(get, range(8)))
+
+    assert _Slow.calls == 2
+    assert all(v is slows[i % 2].value for i, v in enumerate(values))
+    assert pickle.loads(pickle.dumps(slows[0])).value == slows[0].value
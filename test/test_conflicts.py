@@ -0,0 +1,21 @@
+from fixo.conflicts import merge
+from fixo.type_edit import TypeEdit
+
+
+def test_merge():
+    edits = [
+        TypeEdit('A.one', 'bool', 'is_nice', rule='bools'),
+        TypeEdit('A.one', 'int', 'is_nice', rule='ints'),
+        TypeEdit('A.one', 'bool', 'is_nice', rule='other'),
+        TypeEdit('A.is_two', 'bool', rule='bools'),
+        TypeEdit('A.is_two', 'bool', rule='bools'),
+    ]
+    merged, collisions = merge('f.py', edits, ['ints'])
+    assert merged == [TypeEdit('A.one', 'int', 'is_nice'), TypeEdit('A.is_two', 'bool')]
+    assert merged[0].rule == 'ints'
+    (c,) = collisions
+    assert [e.rule for e in c.dropped] == ['bools', 'other']
+    assert (
+        str(c)
+        == 'f.py: A.one(is_nice): kept int (ints), not bool (bools), bool (other)'
+    )
@@ -1,6 +1,19 @@
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from tokenize import generate_tokens
 
+import pytest
+
+from fixo.blocks.python_file import PythonFile
+from fixo.diff import diffs
+from fixo.git_source import GitSource
+from fixo.lintrunner import lint
+from fixo.pipeline import Pipeline
+from fixo.rules import default_rules, direct
 from fixo.token_edit import TokenEdit, perform_edits
+from fixo.type_edit import TypeEdit, perform_type_edits
+from fixo.verify import VerifyError, check_file, verify
 
 SOURCE = """
 
@@ -30,3 +43,198 @@ def test_edit():
     edits = TokenEdit(16, ' -> bool'), TokenEdit(15, ': Tensor')
     actual = perform_edits(edits, tokens)
     assert actual == EXPECTED
+
+
+def test_edit_twice():
+    pf = PythonFile(Path('a.py'), contents=SOURCE)
+    edits = [
+        TypeEdit('Top.is_cool', 'bool'),
+        TypeEdit('Top.is_cool', 'torch.Tensor', 'tensor'),
+    ]
+    once = perform_type_edits(edits, pf)
+    assert 'def is_cool(self, tensor: Tensor) -> bool:' in once
+
+    # A second round finds nothing left to do
+    assert perform_type_edits(edits, pf.with_contents(once)) == once
+
+
+def test_edit_defaults_and_stars():
+    source = 'def f(is_x=True, *is_args, is_y=(1, 2), **is_kw):\n    pass\n'
+    pf = PythonFile(Path('a.py'), contents=source)
+    edits = [
+        TypeEdit('f', 'bool', 'is_x'),
+        TypeEdit('f', 'int', 'is_args'),
+        TypeEdit('f', 'tuple', 'is_y'),
+        TypeEdit('f', 'str', 'is_kw'),
+    ]
+    actual = perform_type_edits(edits, pf).splitlines()[0]
+    expected = (
+        'def f(is_x: bool=True, *is_args: int, is_y: tuple=(1, 2), **is_kw: str):'
+    )
+    assert actual == expected
+
+
+DRIFT_BEFORE = """
+class A:
+    def one(self, is_nice):
+        pass
+
+    @property
+    def one(self):
+        return 1
+"""
+
+DRIFT_AFTER = """
+class A:
+    def one(self, is_nice, other):
+        pass
+
+    def one(self, is_nice):
+        return 2
+
+    @property
+    def one(self):
+        return 1
+"""
+
+DRIFT_EXPECTED = DRIFT_AFTER.replace('one(self, is_nice):', 'one(self, is_nice: bool):')
+
+
+def test_fingerprint_drift():
+    before = PythonFile(Path('a.py'), contents=DRIFT_BEFORE)
+    after = PythonFile(Path('a.py'), contents=DRIFT_AFTER)
+    assert [b.params for b in after.blocks[1:]] == [
+        ['self', 'is_nice', 'other'],
+        ['self', 'is_nice'],
+        ['self'],
+    ]
+
+    edit = TypeEdit('A.one[1]', 'bool', 'is_nice').with_fingerprint(before)
+    assert edit.fingerprint == before.blocks[1].fingerprint
+    assert edit.block(after) is after.blocks[2]
+    assert perform_type_edits([edit], after) == DRIFT_EXPECTED
+
+    # A change to the function itself loses the fingerprint, but not the name
+    changed = PythonFile(Path('a.py'), contents='def f(is_x, y=1):\n    pass\n')
+    original = PythonFile(Path('a.py'), contents='def f(is_x):\n    pass\n')
+    edit = TypeEdit('f', 'bool', 'is_x').with_fingerprint(original)
+    assert edit.fingerprint and edit.block(changed) is changed.blocks[0]
+
+    assert TypeEdit('A.one[1]', 'bool', 'is_nice').block(after) is after.blocks[1]
+
+
+def test_diffs():
+    sample = str(Path(__file__).parent / 'sample_code.py')
+    edits = {sample: [TypeEdit('A.is_two', 'bool')]}
+    (diff,) = diffs(edits.items())
+    assert diff.splitlines()[6:8] == [
+        '-    def is_two(self, i: int):',
+        '+    def is_two(self, i: int) -> bool:',
+    ]
+
+
+def test_diffs_revision(tmp_path):
+    git = 'git', '-C', str(tmp_path), '-c', 'user.name=a', '-c', 'user.email=a@b'
+    file = tmp_path / 'a.py'
+    file.write_text('def is_one(x):\n    pass\n')
+    subprocess.run((*git, 'init', '-q'), check=True)
+    subprocess.run((*git, 'add', 'a.py'), check=True)
+    subprocess.run((*git, 'commit', '-qm', 'a'), check=True)
+    file.write_text('def is_two(x):\n    pass\n')
+
+    source = GitSource('HEAD', tmp_path)
+    edits = {str(file): [TypeEdit('is_one', 'bool')]}
+    try:
+        (diff,) = diffs(edits.items(), source=source)
+        with ThreadPoolExecutor(2) as executor:
+            (message,) = lint(edits.items(), executor, source)
+    finally:
+        source.close()
+    assert diff.splitlines()[3:5] == ['-def is_one(x):', '+def is_one(x) -> bool:']
+    assert message['original'] == 'def is_one(x):\n    pass\n'
+    assert message['replacement'] == 'def is_one(x) -> bool:\n    pass\n'
+
+    # A file that is not in the revision is never read from the working tree
+    new = tmp_path / 'b.py'
+    new.write_text('def is_three(x):\n    pass\n')
+    edits[str(new)] = [TypeEdit('is_three', 'bool')]
+    source = GitSource('HEAD', tmp_path)
+    try:
+        missing = []
+        assert (
+            len(list(diffs(edits.items(), source=source, missing=missing.append))) == 1
+        )
+        assert missing == [str(new)]
+        with pytest.raises(FileNotFoundError, match='Not in the git revision'):
+            list(lint(edits.items(), source=source))
+    finally:
+        source.close()
+
+
+def test_lintrunner():
+    sample = str(Path(__file__).parent / 'sample_code.py')
+    edits = [
+        TypeEdit('A.is_two', 'bool', rule='bools'),
+        TypeEdit('three', 'int', 'self'),
+    ]
+    # One message per file, as lintrunner replaces the whole file to apply one
+    (message,) = lint([(sample, edits)])
+    assert (message['line'], message['name']) == (9, 'bools, edit')
+    assert len(message['description'].splitlines()) == 2
+
+    replacement = message['replacement'].splitlines()
+    assert replacement[8] == '    def is_two(self, i: int) -> bool:'
+    assert replacement[12] == 'def three(self: int, other: int) -> None:'
+    assert message['original'] == Path(sample).read_text()
+
+
+def test_verify():
+    pf = PythonFile(Path('a.py'), contents=SOURCE)
+    verify(pf, EXPECTED)
+
+    for bad, error in (
+        (EXPECTED.replace('True', 'True +'), 'Does not compile'),
+        (EXPECTED.replace('True', 'True + 1'), "Added '\\+'"),
+        (EXPECTED.replace('True', 'False'), "Removed 'True'"),
+        (EXPECTED.replace('is_cool', 'is_cold'), 'Blocks changed'),
+    ):
+        with pytest.raises(VerifyError, match=error):
+            verify(pf, bad)
+
+
+def test_check_file(tmp_path):
+    file = tmp_path / 'a.py'
+    file.write_text('def f(is_x=False, *args, **kwargs):\n    pass\n')
+    edits = [TypeEdit('f', 'bool', 'is_x'), TypeEdit('f', 'int', 'args')]
+
+    checked = check_file(str(file), edits)
+    assert not checked.error
+    contents = Path(checked.temp).read_text()
+    assert contents.startswith('def f(is_x: bool=False, *args: int, **kwargs):')
+    checked.replace()
+    assert file.read_text() == contents
+    assert [p.name for p in tmp_path.iterdir()] == ['a.py']
+
+    checked = check_file(str(file), [TypeEdit('g', 'bool')])
+    assert not checked.temp and checked.error
+
+
+LATIN_1 = "# -*- coding: latin-1 -*-\ndef is_caf\xe9(x):\n    return 'caf\xe9'\n"
+
+
+def test_write_encoding(tmp_path):
+    file = tmp_path / 'latin.py'
+    expected = LATIN_1.replace('(x):', '(x) -> bool:').encode('latin-1')
+    edits = [TypeEdit('is_caf\xe9', 'bool')]
+
+    file.write_bytes(LATIN_1.encode('latin-1'))
+    check_file(str(file), edits).replace()
+    assert file.read_bytes() == expected
+
+    # The -i pipeline writes files itself
+    file.write_bytes(LATIN_1.encode('latin-1'))
+    rules = default_rules('.direct')
+    pipeline = Pipeline(rules, lambda lines: iter(()), scan=direct.scan_file)
+    pipeline.write = True
+    pipeline.run_files([str(file)])
+    assert file.read_bytes() == expected
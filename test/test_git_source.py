@@ -0,0 +1,23 @@
+from pathlib import Path
+
+from fixo.blocks.python_file import PythonFile
+from fixo.git_source import GitSource
+
+HERE = Path(__file__).parent
+SAMPLE_IN = HERE / 'sample_code.py'
+
+
+def test_git_source():
+    source = GitSource('HEAD', HERE.parent)
+    try:
+        sample = str(SAMPLE_IN.relative_to(HERE.parent))
+        blobs = source.read([sample, 'does/not/exist.py'])
+        assert list(blobs) == [sample]
+        assert blobs[sample].data == SAMPLE_IN.read_bytes()
+        assert source.read([sample])[sample] == blobs[sample]
+        assert sample in source.python_files(['test'])
+
+        pf = PythonFile(Path(sample), data=blobs[sample].data)
+        assert pf.tokens == PythonFile(SAMPLE_IN).tokens
+    finally:
+        source.close()
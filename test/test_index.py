@@ -0,0 +1,46 @@
+from pathlib import Path
+
+from fixo.blocks.python_file import PythonFile
+from fixo.index import SymbolIndex
+from fixo.pipeline import Pipeline
+from fixo.rules import default_rules, direct
+
+SAMPLE_IN = Path(__file__).parent / 'sample_code.py'
+
+
+def test_index(tmp_path):
+    target = tmp_path / 'sample_code.py'
+    target.write_text(SAMPLE_IN.read_text())
+    other = tmp_path / 'other.py'
+    other.write_text('def is_one(is_two, three: int):\n    pass\n')
+
+    index = SymbolIndex(tmp_path / 'symbols.index')
+    assert str(index.update([target, other])) == '2 files indexed, 0 unchanged'
+
+    expected = list(direct.scan_file(PythonFile(path=target)))
+    assert list(index.messages(f"file = '{target}'")) == expected
+
+    rules = default_rules('.direct')
+    pipeline = Pipeline(rules, lambda lines: iter(()), scan=direct.scan_file)
+    assert index.edits(rules) == pipeline.run_files([str(target), str(other)])
+
+    rows = index.select("param REGEXP 'is_' AND NOT annotated")
+    assert ('is_one', 'is_two') in [(r['function'], r['param']) for r in rows]
+
+    other.write_text('def is_one(is_two: bool, three: int):\n    pass\n')
+    assert str(index.update([target, other])) == '1 files indexed, 1 unchanged'
+    (row,) = index.select(f"file = '{other}' AND param = 'is_two'")
+    assert row['annotated']
+
+    # A file that no longer parses has its old symbols deleted
+    other.write_text('def is_one(is_two:\n')
+    update = index.update([target, other])
+    assert list(update.errors) == [str(other)]
+    assert not list(index.select(f"file = '{other}'"))
+
+    other.write_text('def is_one(is_two: bool, three: int):\n    pass\n')
+    assert index.update([target, other]).indexed == 1
+    other.unlink()
+    assert index.update([target]).removed == 1
+    assert not list(index.select(f"file = '{other}'"))
+    index.close()
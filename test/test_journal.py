@@ -0,0 +1,33 @@
+from pathlib import Path
+
+from fixo.journal import Journal
+from fixo.pipeline import Pipeline
+from fixo.rules import default_rules, direct
+
+SAMPLE_IN = Path(__file__).parent / 'sample_code.py'
+
+
+def test_journal(tmp_path):
+    rules = default_rules('.direct')
+    target = tmp_path / 'sample_code.py'
+    target.write_text(SAMPLE_IN.read_text())
+    path = tmp_path / 'journal.jsonl'
+
+    def run(resume):
+        journal = Journal(path, resume=resume)
+        pipeline = Pipeline(rules, lambda lines: iter(()), scan=direct.scan_file)
+        pipeline.journal, pipeline.write = journal, True
+        result = pipeline.run_files([str(target)])
+        journal.close()
+        return result
+
+    edits = run(False)
+    edited = target.read_text()
+    assert edited != SAMPLE_IN.read_text()
+
+    # Resuming skips the file, which would otherwise be edited twice
+    assert run(True) == edits
+    assert target.read_text() == edited
+
+    target.write_text(SAMPLE_IN.read_text())
+    assert run(True) == {}
@@ -0,0 +1,44 @@
+from pathlib import Path
+
+from fixo.memory import MemoryBudget, parse_size
+from fixo.pipeline import Pipeline
+from fixo.rules import default_rules, direct
+
+SAMPLE_IN = Path(__file__).parent / 'sample_code.py'
+
+
+def test_memory_budget(tmp_path):
+    rules = default_rules('.direct')
+    files = []
+    for i in range(5):
+        files.append(tmp_path / f'sample{i}.py')
+        files[-1].write_text(SAMPLE_IN.read_text())
+
+    pipeline = Pipeline(rules, lambda lines: iter(()), scan=direct.scan_file)
+    expected = pipeline.run_files(map(str, files))
+    assert len(expected) == 5
+
+    # Always over budget, so the batches shrink to one file each
+    budget = MemoryBudget(limit=1, batch=4)
+    batches = []
+    pipeline = Pipeline(
+        rules,
+        lambda lines: iter(()),
+        scan=direct.scan_file,
+        budget=budget,
+        flush=batches.append,
+    )
+    assert pipeline.run_files(map(str, files)) == {}
+    assert [len(b) for b in batches] == [4, 1]
+    assert budget.batch == 1
+    assert budget.high_water > 0
+    assert {k: v for b in batches for k, v in b.items()} == expected
+
+    # A file named twice is still only in one batch, so it is only flushed once
+    batches.clear()
+    pipeline.run_files(map(str, files + files))
+    flushed = [k for b in batches for k in b]
+    assert sorted(flushed) == sorted(expected)
+
+    assert parse_size('8G') == 8 * 2**30
+    assert parse_size('1.5 MiB') == 3 * 2**19
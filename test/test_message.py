@@ -0,0 +1,35 @@
+import dataclasses as dc
+import json
+from pathlib import Path
+
+from fixo.message import Dedupe
+from fixo.pipeline import Pipeline
+from fixo.rules import default_rules
+from fixo.rules.pyrefly import parse_into_messages
+
+HERE = Path(__file__).parent
+SAMPLE_IN = HERE / 'sample_code.py'
+REPORT = (HERE / 'sample_code.pyrefly.json').read_text()
+
+
+def _messages(file: Path):
+    return [dc.replace(m, file=str(file)) for m in parse_into_messages(REPORT)]
+
+
+def test_dedupe():
+    rules = default_rules('.pyrefly')
+    messages = _messages(SAMPLE_IN)
+
+    # The same function, reported again under the name it is re-exported as
+    again = [dc.replace(m, name='reexport.' + m.name) for m in messages[:3]]
+    pipeline = Pipeline(rules, lambda lines: iter(messages + again))
+    assert pipeline.run(()) == Pipeline(rules, lambda lines: iter(messages)).run(())
+    assert pipeline.dedupe.removed == 3
+
+    report = json.loads(REPORT)
+    for file in report.values():
+        file['functions'] *= 2
+    dedupe = Dedupe()
+    file_messages = rules['bools'].file_messages(json.dumps(report), dedupe)
+    assert dedupe.removed == len(messages)
+    assert sum(len(m) for m in file_messages.values()) == len(messages)
@@ -0,0 +1,202 @@
+import dataclasses as dc
+import gc
+import pickle
+import time
+import weakref
+from pathlib import Path
+
+from fixo.blocks.python_file import PythonFile
+from fixo.cache import RuleCache
+from fixo.message import Category, LineCharacter, Message
+from fixo.pipeline import FileEditor, Pipeline
+from fixo.public import PublicApi
+from fixo.rules import default_rules, direct
+from fixo.rules.pyrefly import parse_into_messages
+from fixo.type_edit import perform_type_edits
+
+HERE = Path(__file__).parent
+SAMPLE_IN = HERE / 'sample_code.py'
+REPORT = (HERE / 'sample_code.pyrefly.json').read_text()
+
+
+def _messages(file: Path):
+    return [dc.replace(m, file=str(file)) for m in parse_into_messages(REPORT)]
+
+
+def test_pipeline_matches_rules():
+    rules = default_rules('.pyrefly')
+    messages = _messages(SAMPLE_IN)
+    file_messages = rules['bools'].file_messages(REPORT)
+    file_messages = {str(SAMPLE_IN): [m for v in file_messages.values() for m in v]}
+
+    actual = Pipeline(rules, lambda lines: iter(messages)).run(())
+    expected = [e for r in rules.values() for e in r.edits(file_messages)]
+
+    assert list(actual) == [str(SAMPLE_IN)]
+    assert sorted(actual[str(SAMPLE_IN)]) == sorted(expected)
+    assert {e.rule for e in actual[str(SAMPLE_IN)]} == {'bools'}
+
+
+def test_pipeline_write(tmp_path):
+    rules = default_rules('.pyrefly')
+    target = tmp_path / 'sample_code.py'
+    target.write_text(SAMPLE_IN.read_text())
+    messages = _messages(target)
+
+    # Split the messages so the same file is edited twice
+    half = len(messages) // 2
+    other = dc.replace(messages[0], file=str(tmp_path / 'missing.py'))
+    messages = messages[:half] + [other] + messages[half:]
+
+    edits = Pipeline(rules, lambda lines: iter(messages), write=True).run(())
+    expected = perform_type_edits(edits[str(target)], PythonFile(path=SAMPLE_IN))
+    assert target.read_text() == expected
+
+
+INTERLEAVED = """\
+def three(self):
+    pass
+
+
+def is_five(x):
+    pass
+"""
+
+
+def test_pipeline_interleaved(tmp_path):
+    rules = default_rules('.pyright')
+    target = tmp_path / 'a.py'
+    target.write_text(INTERLEAVED)
+
+    def message(file, line, text):
+        start = LineCharacter(line, 0)
+        return Message('', str(file), '', text, start, start, Category.function)
+
+    # The first edit inserts an import, which moves `is_five` down, and the
+    # file's messages come in two groups with another file's in between
+    messages = [
+        message(target, 1, 'Type annotation for parameter "self" is missing'),
+        message(tmp_path / 'missing.py', 1, 'Return type is missing'),
+        message(target, 5, 'Return type is missing'),
+    ]
+    pipeline = Pipeline(rules, lambda lines: iter(messages))
+    assert list(pipeline.run(())) == [str(target)]
+    assert pipeline.run((), only={str(tmp_path / 'other.py')}) == {}
+
+    edits = Pipeline(rules, lambda lines: iter(messages), write=True).run(())
+    assert sorted(e.function_name for e in edits[str(target)]) == ['is_five', 'three']
+    pf = PythonFile(target, contents=INTERLEAVED)
+    assert target.read_text() == perform_type_edits(edits[str(target)], pf)
+
+    # A file named twice is merged once, so its edits are not repeated
+    rules = default_rules('.direct')
+    scan = Pipeline(rules, lambda lines: iter(()), scan=direct.scan_file)
+    sample, other = str(SAMPLE_IN), str(target)
+    once = scan.run_files([sample])[sample]
+    assert scan.run_files([sample, other, sample])[sample] == once
+
+
+def test_pipeline_write_failures(tmp_path, capsys):
+    rules = default_rules('.pyright')
+    good, bad = tmp_path / 'good.py', tmp_path / 'bad.py'
+    good.write_text(INTERLEAVED)
+    # A name the edit cannot be found in, so the file fails and is left alone
+    bad.write_text(INTERLEAVED.replace('def is_five(x)', 'is_five = lambda x'))
+
+    def message(file, line, text):
+        start = LineCharacter(line, 0)
+        return Message('', str(file), '', text, start, start, Category.function)
+
+    messages = [message(f, 5, 'Return type is missing') for f in (bad, good)]
+    Pipeline(rules, lambda lines: iter(messages), write=True).run(())
+    assert 'def is_five(x) -> bool:' in good.read_text()
+    assert 'lambda' in bad.read_text()
+
+    # The failures and their count come before any file is written, as they do
+    # when an edits file is applied
+    err = capsys.readouterr().err.splitlines()
+    assert err[0].startswith(f'ERROR: {bad}:')
+    assert err[1:] == ['verify: 1 of 2 files failed, unchanged', f'{good}: 1']
+
+
+def test_pipeline_grouped(tmp_path, capsys):
+    rules = default_rules('.pyright')
+    a, b = tmp_path / 'a.py', tmp_path / 'b.py'
+    for f in a, b:
+        f.write_text(INTERLEAVED)
+
+    def message(file, line, text):
+        start = LineCharacter(line, 0)
+        return Message('', str(file), '', text, start, start, Category.function)
+
+    rendered = []
+
+    def parse_lines(lines):
+        yield message(a, 1, 'Type annotation for parameter "self" is missing')
+        yield message(b, 1, 'Type annotation for parameter "self" is missing')
+        # The checker is still running, but `a` is already edited, and waits to be
+        # moved into place until every file is checked
+        deadline = time.time() + 10
+        while not list(tmp_path.glob('.a.py.*')) and time.time() < deadline:
+            time.sleep(0.01)
+        rendered.append(a.read_text() == INTERLEAVED and time.time() < deadline)
+        yield message(b, 5, 'Return type is missing')
+        yield message(a, 5, 'Return type is missing')
+
+    pipeline = Pipeline(rules, parse_lines, write=True, grouped=True)
+    edits = pipeline.run(())
+    assert rendered == [True]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['a.py', 'b.py']
+    assert [e.function_name for e in edits[str(a)]] == ['three']
+    assert sorted(e.function_name for e in edits[str(b)]) == ['is_five', 'three']
+    assert 'Reported again after other files' in capsys.readouterr().err
+
+
+def test_pipeline_releases_messages(tmp_path):
+    rules = default_rules('.pyright')
+    a, b = tmp_path / 'a.py', tmp_path / 'b.py'
+    for f in a, b:
+        f.write_text(INTERLEAVED)
+
+    def message(file, line, text):
+        start = LineCharacter(line, 0)
+        return Message('', str(file), '', text, start, start, Category.function)
+
+    refs, released = [], []
+
+    def parse_lines(lines):
+        for line in 1, 5:
+            m = message(a, line, 'Return type is missing')
+            refs.append(weakref.ref(m))
+            yield m
+        del m
+        yield message(b, 5, 'Return type is missing')
+        # `a` has been edited while the checker is still running, and nothing
+        # keeps its messages any more
+        deadline = time.time() + 10
+        while any(r() for r in refs) and time.time() < deadline:
+            gc.collect()
+            time.sleep(0.01)
+        released.append(not any(r() for r in refs))
+
+    Pipeline(rules, parse_lines, grouped=True).run(())
+    assert released == [True]
+
+
+def test_editor_pickle(tmp_path):
+    public = PublicApi()
+    editor = FileEditor(
+        default_rules('.direct'), cache=RuleCache(tmp_path), public=public
+    )
+    data = pickle.dumps(editor)
+
+    # What the editor caches is not sent to workers with each file
+    assert public.is_public(SAMPLE_IN, 'A.one')
+    assert pickle.dumps(editor) == data
+
+    # A worker builds its own editor once, and keeps it for each file it is sent
+    worker = pickle.loads(data)
+    assert pickle.loads(pickle.dumps(editor)) is worker
+    assert isinstance(worker.public, PublicApi) and worker.public is not public
+    assert worker.cache.root == tmp_path
+    assert worker.rules.keys() == editor.rules.keys()
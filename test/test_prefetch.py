@@ -0,0 +1,17 @@
+from fixo.prefetch import read_ahead
+
+
+def test_read_ahead(tmp_path):
+    files = [tmp_path / f'{i}.py' for i in range(5)]
+    for i, f in enumerate(files):
+        f.write_text(f'x = {i}\n')
+    files.insert(2, tmp_path / 'missing.py')
+
+    read = []
+    items = read_ahead(files, lambda f: read.append(f) or f, ahead=2)
+    assert next(items) == (files[0], b'x = 0\n')
+    assert read == files[:3]
+
+    rest = list(items)
+    assert [f for f, _ in rest] == files[1:]
+    assert rest[1] == (files[2], None)
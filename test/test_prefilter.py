@@ -0,0 +1,31 @@
+import dataclasses as dc
+from pathlib import Path
+
+from fixo.pipeline import Pipeline
+from fixo.prefilter import Prefilter
+from fixo.rules import default_rules, direct
+
+SAMPLE_IN = Path(__file__).parent / 'sample_code.py'
+
+
+def test_prefilter(tmp_path):
+    rules = default_rules('.direct')
+    pre = Prefilter.create(rules.values())
+    assert pre is not None
+    assert pre.accept_file(SAMPLE_IN)
+
+    other = tmp_path / 'other.py'
+    other.write_text('def this_is_fine(myself, x_is_y):\n    pass\n')
+    assert not pre.accept_file(other)
+
+    pruned = []
+    files = [SAMPLE_IN, other, tmp_path / 'missing']
+    assert list(pre.files(files, pruned)) == [SAMPLE_IN, tmp_path / 'missing']
+    assert pruned == [other]
+
+    pipeline = Pipeline(rules, lambda lines: iter(()), scan=direct.scan_file)
+    pipeline.prefilter = pre
+    assert list(pipeline.run_files([str(SAMPLE_IN), str(other)])) == [str(SAMPLE_IN)]
+    assert pipeline.pruned == 1
+
+    assert Prefilter.create([dc.replace(rules['bools'], name_match='is$')]) is None
@@ -0,0 +1,38 @@
+import dataclasses as dc
+import io
+import json
+from pathlib import Path
+
+from fixo.pipeline import Pipeline
+from fixo.progress import Progress
+from fixo.rules import default_rules
+from fixo.rules.pyrefly import parse_into_messages
+
+HERE = Path(__file__).parent
+SAMPLE_IN = HERE / 'sample_code.py'
+REPORT = (HERE / 'sample_code.pyrefly.json').read_text()
+
+
+def _messages(file: Path):
+    return [dc.replace(m, file=str(file)) for m in parse_into_messages(REPORT)]
+
+
+def test_progress():
+    stream = io.StringIO()
+    progress = Progress(stream, interval=60)
+    assert progress.as_json
+
+    progress.start('find', total=2)
+    rules = default_rules('.pyrefly')
+    messages = _messages(SAMPLE_IN)
+    pipeline = Pipeline(rules, lambda lines: iter(messages), progress=progress)
+    edits = pipeline.run(())
+    progress.finish()
+
+    # Only the start and the end are reported inside the interval
+    first, last = (json.loads(line) for line in stream.getvalue().splitlines())
+    assert (first['stage'], first['files'], first['eta']) == ('find', 0, None)
+    assert last['files'] == 1
+    assert last['messages'] == len(messages)
+    assert last['edits'] == sum(len(e) for e in edits.values())
+    assert last['eta'] is not None
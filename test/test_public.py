@@ -0,0 +1,64 @@
+from fixo.pipeline import Pipeline
+from fixo.public import PublicApi
+from fixo.rules import default_rules, direct
+
+FILES = {
+    'pkg/__init__.py': 'from ._impl import is_one\nfrom .sub import *\n',
+    'pkg/_impl.py': 'def is_one(x):\n    pass\n\ndef is_two(x):\n    pass\n',
+    'pkg/sub/__init__.py': (
+        "from ._more import is_three, is_four\n__all__ = ['is_three']\n"
+    ),
+    'pkg/sub/_more.py': 'def is_three(x):\n    pass\n\ndef is_four(x):\n    pass\n',
+    'pkg/mod.py': (
+        "__all__ = ['is_five']\n__all__ += ['A']\n\n"
+        'def is_five(x):\n    pass\n\ndef is_six(x):\n    pass\n\n'
+        'class A:\n    def is_seven(self):\n        pass\n\n'
+        '    def _is_eight(self):\n        pass\n'
+    ),
+    'pkg/_private/__init__.py': 'def is_nine(x):\n    pass\n',
+}
+
+
+def _write(tmp_path):
+    for name, contents in FILES.items():
+        (p := tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        p.write_text(contents)
+
+
+def test_public(tmp_path):
+    _write(tmp_path)
+    public = PublicApi()
+    pkg = tmp_path / 'pkg'
+
+    assert public.module(pkg / 'sub/_more.py') == (tmp_path, ('pkg', 'sub', '_more'))
+    assert public.module(pkg / '__init__.py') == (tmp_path, ('pkg',))
+
+    impl, more, mod = pkg / '_impl.py', pkg / 'sub/_more.py', pkg / 'mod.py'
+    assert public.is_public(impl, 'is_one')
+    assert not public.is_public(impl, 'is_two')
+    assert public.is_public(more, 'is_three')
+    assert not public.is_public(more, 'is_four')
+    assert public.is_public(mod, 'is_five')
+    assert public.is_public(mod, 'pkg.mod.is_five')
+    assert not public.is_public(mod, 'is_six')
+    assert public.is_public(mod, 'A.is_seven')
+    assert not public.is_public(mod, 'A._is_eight')
+
+    assert public.may_be_public(impl)
+    assert not public.may_be_public(pkg / '_private/__init__.py')
+
+
+def test_public_pipeline(tmp_path):
+    _write(tmp_path)
+    files = sorted(str(p) for p in tmp_path.rglob('*.py'))
+    rules = {'bools': default_rules('.direct')['bools']}
+
+    def functions(public):
+        pipeline = Pipeline(
+            rules, lambda lines: iter(()), scan=direct.scan_file, public=public
+        )
+        edits = pipeline.run_files(files)
+        return sorted(e.function_name for v in edits.values() for e in v)
+
+    assert len(functions(None)) == 8
+    assert functions(PublicApi()) == ['A.is_seven', 'is_five', 'is_one', 'is_three']
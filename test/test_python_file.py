@@ -0,0 +1,150 @@
+import mmap
+from pathlib import Path
+
+from fixo.blocks import python_file
+from fixo.blocks.python_file import PythonFile
+from fixo.type_edit import TypeEdit, perform_type_edits
+
+SAMPLE_IN = Path(__file__).parent / 'sample_code.py'
+
+
+def test_mapped_tokens(monkeypatch):
+    monkeypatch.setattr(python_file, 'MMAP_MIN_SIZE', 0)
+    pf = PythonFile(SAMPLE_IN)
+    assert isinstance(pf.buffer, mmap.mmap)
+    expected = PythonFile(SAMPLE_IN, contents=SAMPLE_IN.read_text())
+    assert pf.tokens == expected.tokens
+    assert 'contents' not in vars(pf)
+    assert [pf.line(i + 1) for i in range(len(expected.lines))] == expected.lines
+
+
+def test_mapped_encoding(tmp_path):
+    source = '# -*- coding: latin-1 -*-\ndef is_\xe9(x):\n    pass'
+    path = tmp_path / 'latin.py'
+    path.write_bytes(source.encode('latin-1'))
+
+    pf = PythonFile(path)
+    assert pf.encoding == 'iso-8859-1'
+    assert pf.blocks[0].name == 'is_\xe9'
+    assert pf.line(2) == 'def is_\xe9(x):\n'
+    assert pf.contents == source
+
+
+def test_mapped_crlf(tmp_path, monkeypatch):
+    monkeypatch.setattr(python_file, 'MMAP_MIN_SIZE', 0)
+    path = tmp_path / 'crlf.py'
+    path.write_bytes(b'def is_one(x):\r\n    pass\r\n')
+
+    pf = PythonFile(path)
+    assert isinstance(pf.buffer, mmap.mmap)
+    assert pf.encoding == 'utf-8'
+    assert pf.line(1) == 'def is_one(x):\r\n'
+    contents = perform_type_edits([TypeEdit('is_one', 'bool')], pf)
+    assert contents == 'def is_one(x) -> bool:\r\n    pass\r\n'
+
+    # Released, so the file can be rewritten
+    pf.close()
+    assert 'buffer' not in vars(pf)
+    path.write_bytes(contents.encode())
+    assert PythonFile(path).contents == contents
+
+
+FORM_FEED_SOURCE = (
+    'def is_a(x):\n    pass\n\x0c\n# a\rcomment\ndef is_b(y):\n    pass\n'
+)
+
+
+def test_form_feed(tmp_path, monkeypatch):
+    monkeypatch.setattr(python_file, 'MMAP_MIN_SIZE', 0)
+    path = tmp_path / 'ff.py'
+    path.write_bytes(FORM_FEED_SOURCE.encode())
+    edits = [TypeEdit('is_a', 'bool'), TypeEdit('is_b', 'bool')]
+    expected = FORM_FEED_SOURCE.replace('):', ') -> bool:')
+
+    for pf in PythonFile(path), PythonFile(path, contents=FORM_FEED_SOURCE):
+        # Token rows and lines split the file in the same places
+        assert all(pf.lines[t.start[0] - 1] == t.line for t in pf.tokens if t.line)
+        assert [b.name for b in pf.blocks] == ['is_a', 'is_b']
+        assert perform_type_edits(edits, pf) == expected
+        assert pf.patched(t for e in edits for t in e.apply(pf)).contents == expected
+
+
+PATCH_SOURCE = '''\
+"""A docstring"""
+import os
+
+
+class A:
+    @property
+    def is_one(self, is_on):
+        return 1
+
+        # A comment
+    def two(
+        self,
+        is_x,  # comment
+    ):
+        class B:
+            def is_three(self): ...
+    # Another comment
+
+def four(tensor, is_y):
+    pass
+'''
+
+
+def test_patched():
+    pf = PythonFile(Path('a.py'), contents=PATCH_SOURCE)
+    edits = [
+        TypeEdit('A.is_one', 'bool'),
+        TypeEdit('A.is_one', 'bool', 'is_on'),
+        TypeEdit('A.two', 'bool', 'is_x'),
+        TypeEdit('A.two.B.is_three', 'bool'),
+        TypeEdit('four', 'torch.Tensor', 'tensor'),
+        TypeEdit('four', 'bool', 'is_y'),
+    ]
+    token_edits = [t for e in edits for t in e.apply(pf)]
+    patched = pf.patched(token_edits)
+    assert patched.contents == perform_type_edits(edits, pf)
+    assert {'tokens', 'blocks', 'imports'} <= set(vars(patched))
+
+    expected = PythonFile(Path('a.py'), contents=patched.contents)
+    assert patched.tokens == expected.tokens
+    assert patched.lines == expected.lines
+    assert patched.indent_to_dedent == expected.indent_to_dedent
+    assert patched.imports == expected.imports
+    for a, b in zip(patched.blocks, expected.blocks, strict=True):
+        assert a.as_data() == b.as_data()
+        assert (a.begin, a.end, a.signature) == (b.begin, b.end, b.signature)
+
+
+def test_patched_falls_back():
+    # Untokenizing loses the space before a backslash continuation
+    pf = PythonFile(
+        Path('a.py'), contents='def is_a(x):\n    return x \\\n        + 1\n'
+    )
+    patched = pf.patched(TypeEdit('is_a', 'bool').apply(pf))
+    assert 'tokens' not in vars(patched)
+    assert patched.contents == perform_type_edits([TypeEdit('is_a', 'bool')], pf)
+    assert patched.blocks[0].signature[1]
+
+
+def test_block_table():
+    pf = PythonFile(Path('a.py'), contents=PATCH_SOURCE)
+    table = pf.block_table
+    assert pf.blocks == table.blocks
+    assert not hasattr(pf.blocks[0], '__dict__')
+
+    a, is_one, two, b, is_three, four = pf.blocks
+    assert [x.full_name for x in pf.blocks] == [
+        'A',
+        'A.is_one',
+        'A.two',
+        'A.two.B',
+        'A.two.B.is_three',
+        'four',
+    ]
+    assert (a.children, two.children, four.children) == ([1, 2, 3, 4], [3, 4], [])
+    assert (b.parent, four.parent) == (2, None)
+    assert (is_one.is_method, b.is_local, is_three.is_local) == (True, True, True)
+    assert table.docstring[a.index] == -1 and a.docstring == ''
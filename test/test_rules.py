@@ -6,7 +6,8 @@ from pathlib import Path
 import pytest
 
 from fixo.blocks.python_file import PythonFile
-from fixo.rules import default_rules
+from fixo.pipeline import Pipeline
+from fixo.rules import default_rules, direct
 from fixo.type_edit import TypeEdit, perform_type_edits
 
 SAMPLE_IN = Path(__file__).parent / 'sample_code.py'
@@ -85,3 +86,14 @@ EXPECTED_EDITS = {
         TypeEdit(function_name='three', type_name='torch.Tensor', param='self'),
     ],
 }
+
+
+def test_direct():
+    rules = default_rules('.direct')
+    file_messages = rules['bools'].file_messages(str(SAMPLE_IN))
+    edits = {k: sorted(v.edits(file_messages)) for k, v in rules.items()}
+    assert edits == EXPECTED_EDITS
+
+    pipeline = Pipeline(rules, lambda lines: iter(()), scan=direct.scan_file)
+    (actual,) = pipeline.run_files([str(SAMPLE_IN)]).values()
+    assert sorted(actual) == sorted(i for e in EXPECTED_EDITS.values() for i in e)
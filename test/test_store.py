@@ -0,0 +1,28 @@
+from fixo.store import EditStore, Status
+from fixo.type_edit import TypeEdit
+
+EDITS = {
+    'a.py': [
+        TypeEdit('A.one', 'bool', 'is_nice', rule='bools', fingerprint='f1'),
+        TypeEdit('three', 'torch.Tensor', 'self', rule='self_params'),
+    ],
+    'b/c.py': [TypeEdit('is_two', 'bool', rule='bools')],
+}
+
+
+def test_store(tmp_path):
+    store = EditStore(tmp_path / 'edits.db')
+    assert store.add(EDITS.items()) == 3
+    assert store.add(EDITS.items()) == 0
+
+    assert store.mark(Status.accepted, "rule = 'bools'") == 2
+    assert store.mark(Status.rejected, "file LIKE 'b/%'") == 1
+
+    (row,) = store.select("status = 'accepted'")
+    assert row['function'] == 'A.one'
+
+    accepted = list(store.accepted())
+    assert accepted == [('a.py', [EDITS['a.py'][0]])]
+    assert accepted[0][1][0].fingerprint == 'f1'
+    assert store.files("type = 'bool'") == ['a.py', 'b/c.py']
+    assert store.files("type = 'bool'", Status.accepted) == ['a.py']
@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+from fixo.store import Status
+from fixo.tui import Context, EditsFile
+from fixo.type_edit import TypeEdit
+
+from .test_store import EDITS
+
+
+def test_edits_file(tmp_path):
+    path = tmp_path / 'edits.json'
+    data = {k: [e.asdict() for e in v] for k, v in EDITS.items()}
+    path.write_text(json.dumps(data, indent=4))
+
+    edits = EditsFile(path)
+    assert len(edits) == 3
+    assert [edits.edit(i) for i in range(3)] == [*EDITS['a.py'], *EDITS['b/c.py']]
+    assert edits.summary(2) == 'b/c.py: is_two -> bool [bools]'
+
+    assert edits.mark(edits.by_rule('bools'), Status.accepted) == 2
+    assert edits.mark(edits.by_file('b/c.py'), Status.rejected) == 1
+    assert edits.mark(edits.by_regex(r'\(self\)'), Status.accepted) == 1
+    assert [edits.get_status(i) for i in range(3)] == [
+        Status.accepted,
+        Status.accepted,
+        Status.rejected,
+    ]
+
+    output = tmp_path / 'accepted.json'
+    assert edits.write(output) == 2
+    # Untouched entries are copied as they were
+    assert output.read_text() == json.dumps({'a.py': data['a.py']}, indent=4) + '\n'
+    assert len(EditsFile(output)) == 2
+
+    # The pending edits are still in the original
+    with pytest.raises(ValueError):
+        edits.write(path)
+    assert len(EditsFile(path)) == 3
+
+
+def test_context(tmp_path):
+    file = tmp_path / 'a.py'
+    file.write_text('def is_one(x):\n    return True\n')
+
+    context = Context()
+    lines = context(str(file), TypeEdit('is_one', 'bool'))
+    assert lines[-3:] == [
+        '-def is_one(x):',
+        '+def is_one(x) -> bool:',
+        '     return True',
+    ]
+    assert context(str(file), TypeEdit('is_two', 'bool'))[0].startswith('ERROR:')